@@ -0,0 +1,97 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Import-time benchmark for pyCalc.
+
+Each run imports pyCalc in a fresh python process (``python -X importtime``)
+and records the cumulative import time of pyCalc. The heavy modules that
+pyCalc imports on first use (numpy, psutil, uno, ...) must not be loaded by
+``import pyCalc``; loading one of them is always a regression::
+
+    python benchmarks/bench_import.py              # run and compare
+    python benchmarks/bench_import.py --save       # update baseline
+"""
+
+# standard imports
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+here = Path(__file__).resolve().parent
+
+# modules that pyCalc imports on first use
+lazy_modules = ('numpy', 'psutil', 'uno', 'unotools', 'asyncio', 'concurrent.futures', 'zipfile',
+                'xml.etree.ElementTree')
+
+_script = f'''
+import json
+import sys
+import pyCalc
+print('loaded', json.dumps([name for name in {lazy_modules!r} if name in sys.modules]))
+'''
+
+
+def import_once():
+    """Return (import time of pyCalc in seconds, heavy modules loaded)."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([str(here.parent), os.environ.get('PYTHONPATH', '')]))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', _script], cwd=here.parent, env=env,
+                            capture_output=True, text=True, check=True)
+    t = None
+    for line in result.stderr.splitlines():
+        if line.rstrip().endswith('| pyCalc'):
+            t = int(line.split('|')[1])*1e-6
+    loaded = []
+    for line in result.stdout.splitlines():
+        if line.startswith('loaded'):
+            loaded = json.loads(line[len('loaded'):])
+    return t, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=10, help='number of imports (median is kept)')
+    parser.add_argument('--baseline', type=Path, default=here / 'baseline.json')
+    parser.add_argument('--save', action='store_true', help='save result as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=1.5, help='max time ratio to baseline')
+    parser.add_argument('--check-time', action='store_true', help='fail if slower than the baseline')
+    args = parser.parse_args()
+
+    times = []
+    loaded = set()
+    for _ in range(args.repeat):
+        t, modules = import_once()
+        times.append(t)
+        loaded.update(modules)
+    result = dict(time=statistics.median(times), best=min(times), loaded=sorted(loaded))
+
+    stored = json.loads(args.baseline.read_text()) if args.baseline.exists() else dict()
+    base = stored.get('import', {})
+    print(f'import pyCalc: {result["time"]*1e3:.1f} ms (median), {result["best"]*1e3:.1f} ms (best)', end='')
+    if 'time' in base:
+        print(f', baseline {base["time"]*1e3:.1f} ms')
+    else:
+        print()
+
+    regressions = []
+    if loaded:
+        regressions.append(f'heavy modules loaded at import: {sorted(loaded)}')
+    if 'time' in base and result['time'] > base['time']*args.tolerance:
+        if args.check_time:
+            regressions.append('import time')
+        else:
+            print('slower than baseline')
+
+    if args.save:
+        stored['import'] = result
+        args.baseline.write_text(json.dumps(stored, indent=1, sort_keys=True))
+        print(f'baseline saved at {args.baseline}')
+    elif regressions:
+        print('REGRESSION: ' + '; '.join(regressions))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmarks for pyCalc.
+
+By default, pyCalc runs against the local stand-in UNO objects of
+:py:mod:`fake_uno`, which count bridge calls and simulate a per-call latency.
+With ``--real``, the benchmarks run against a headless libreoffice (bridge
+calls are not counted).
+
+Results are compared with a stored baseline (``baseline.json``)::
+
+    python benchmarks/bench_pyCalc.py                  # run and compare
+    python benchmarks/bench_pyCalc.py --save           # update baseline
+    python benchmarks/bench_pyCalc.py --latency 50e-6 --sizes 100 1000
+    python benchmarks/bench_pyCalc.py --real
+"""
+
+# standard imports
+import argparse
+import json
+import socket
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+here = Path(__file__).resolve().parent
+sys.path.insert(0, str(here.parent))
+sys.path.insert(0, str(here))
+
+import fake_uno
+fake_uno.install()
+import pyCalc
+
+
+def parameter_rows(n_rows, group_size=10):
+    """Rows of a parameter sheet (header + n_rows parameters)."""
+    rows = [['group', 'id', 'description', 'dummy', 'min', 'guess', 'max', 'fit', 'error', 'warning', 'comments']]
+    for i in range(n_rows):
+        rows.append([f'g{i // group_size}', f'p{i}', 'parameter', '', '-inf' if i % 3 else 0.0, float(i), 'inf', '', '', '', ''])
+    return rows
+
+
+class Backend(object):
+    """Creates documents and counts bridge calls (fake) or not (real)."""
+
+    def __init__(self, real=False, latency=0.0, port=8100):
+        self.real = real
+        self.bridge = fake_uno.bridge
+        self.bridge.latency = latency
+        self.calcObject = None
+        self.tempdir = tempfile.TemporaryDirectory(prefix='bench_pyCalc_')
+        pyCalc._cache_dir = Path(self.tempdir.name) / 'cache'
+        if real:
+            # own profile, so the user's office is neither attached to nor locked
+            self.calcObject = pyCalc.connect2Calc(port=port, headless=True,
+                                                  profile=Path(self.tempdir.name) / 'profile')
+            # target sheet of the copy benchmarks (a new document has one sheet)
+            self.calcObject.insert_sheets_new_by_name('Sheet2', 1)
+
+    def new_sheet(self, rows=()):
+        if self.real:
+            for index in (1, 0):
+                sheetObject = self.calcObject.get_sheet_by_index(index)
+                sheetObject.get_cell_range_by_position(0, 0, 1023, 100000).clearContents(1023)
+            calcObject = self.calcObject
+        else:
+            calcObject = fake_uno.Calc(bridge=self.bridge, sheets=('Sheet1', 'Sheet2'))
+            sheetObject = calcObject.get_sheet_by_index(0)
+        if len(rows) > 0:
+            pyCalc.set_cells_value(sheetObject, 0, 0, rows, type='data')
+        return calcObject, sheetObject
+
+    @property
+    def calls(self):
+        return None if self.real else self.bridge.calls
+
+    def reset(self):
+        self.bridge.reset()
+
+    def saved_file(self, name):
+        """Path of a file standing for a saved document."""
+        path = Path(self.tempdir.name) / name
+        path.write_text(name)
+        return path
+
+    def close(self):
+        if self.calcObject is not None:
+            pyCalc.closeCalc(self.calcObject)
+            pyCalc.shutdown_libreoffice(self.calcObject)
+        self.tempdir.cleanup()
+
+
+def measure(backend, prepare, repeat=1):
+    """Return (best time in seconds, bridge calls of one run).
+
+    ``prepare()`` creates the data and returns the function to be timed.
+    """
+    best = None
+    calls = None
+    for _ in range(repeat):
+        run = prepare()
+        backend.reset()
+        t0 = time.perf_counter()
+        run()
+        t = time.perf_counter() - t0
+        calls = backend.calls
+        best = t if best is None else min(best, t)
+    return best, calls
+
+
+def bench_connect(backend, startup=0.2):
+    """Startup handshake against a port that opens after ``startup`` seconds."""
+    if backend.real:
+        with tempfile.TemporaryDirectory() as profile:
+            calcObject, times = pyCalc.connect2Calc(port=8101, headless=True, profile=profile, timing=True)
+            pyCalc.closeCalc(calcObject)
+        return dict(time=times['total'], calls=None)
+
+    listener = socket.socket()
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(('localhost', 0))
+    port = listener.getsockname()[1]
+
+    def accept():
+        time.sleep(startup)
+        listener.listen()
+    thread = threading.Thread(target=accept)
+    thread.start()
+    connect = pyCalc.connect
+    pyCalc.connect = lambda connection, **kwargs: fake_uno.Struct('Context')
+    t0 = time.perf_counter()
+    try:
+        pyCalc._connect_context(port, timeout=10)
+    finally:
+        pyCalc.connect = connect
+        thread.join()
+        listener.close()
+    return dict(time=time.perf_counter() - t0 - startup, calls=None)
+
+
+def benchmarks(backend, n_rows):
+    """Yield (name, prepare) for each benchmark (see :py:func:`measure`)."""
+    rows = parameter_rows(n_rows)
+    block = [[float(i*11 + j) for j in range(11)] for i in range(n_rows)]
+
+    def get_cells():
+        calcObject, sheetObject = backend.new_sheet(block)
+        return lambda: pyCalc.get_cells_value(sheetObject, 0, 0, n_rows-1, 10)
+    yield 'get_cells_value', get_cells
+
+    def set_cells():
+        calcObject, sheetObject = backend.new_sheet()
+        return lambda: pyCalc.set_cells_value(sheetObject, 0, 0, block, type='data')
+    yield 'set_cells_value', set_cells
+
+    for Font in range(5):
+        def copy_cell(Font=Font):
+            calcObject, sheetObject = backend.new_sheet(block[:10])
+            target = calcObject.get_sheet_by_index(1)
+            return lambda: pyCalc.copy_cell(sheetObject, target, 0, 0, Font=Font)
+        yield f'copy_cell[Font={Font}]', copy_cell
+
+        def copy_cells(Font=Font):
+            calcObject, sheetObject = backend.new_sheet(block)
+            target = calcObject.get_sheet_by_index(1)
+            return lambda: pyCalc.copy_cells(sheetObject, target, 0, 0, n_rows, 11, Font=Font)
+        yield f'copy_cells[Font={Font}]', copy_cells
+
+    def load():
+        calcObject, sheetObject = backend.new_sheet(rows)
+        return lambda: pyCalc.loadCalc(sheetObject)
+    yield 'loadCalc', load
+
+    if not backend.real:
+        def load_cached():
+            calcObject, sheetObject = backend.new_sheet(rows)
+            calcObject.Location = backend.saved_file(f'parameters{n_rows}.ods').as_uri()
+            calcObject._modified = False
+            pyCalc.loadCalc('Sheet1', calcObject, cache=True)
+            return lambda: pyCalc.loadCalc('Sheet1', calcObject, cache=True)
+        yield 'loadCalc[cache]', load_cached
+
+    def update():
+        calcObject, sheetObject = backend.new_sheet(rows)
+        sheetObject, parameters = pyCalc.loadCalc(sheetObject)
+        for group in parameters:
+            parameters[group]['fit'] = parameters[group]['guess'] + 1
+            parameters[group]['error'] = parameters[group]['guess']*0 + 0.1
+        return lambda: pyCalc.update_xlsx(parameters, sheetObject)
+    yield 'update_xlsx', update
+
+    def update_cached():
+        calcObject, sheetObject = backend.new_sheet(rows)
+        sheetObject, parameters = pyCalc.loadCalc(sheetObject)
+        for group in parameters:
+            parameters[group]['fit'] = parameters[group]['guess'] + 1
+            parameters[group]['error'] = parameters[group]['guess']*0 + 0.1
+        return lambda: pyCalc.update_xlsx(parameters, sheetObject, cached=True)
+    yield 'update_xlsx[cached]', update_cached
+
+    def color():
+        calcObject, sheetObject = backend.new_sheet(rows)
+        return lambda: pyCalc.group_color(sheetObject, calcObject)
+    yield 'group_color', color
+
+
+def compare(results, baseline, tolerance, check_time=False):
+    """Print results next to the baseline. Returns the list of regressions.
+
+    More bridge calls than the baseline is always a regression. Times are
+    noisy, so slower runs are only counted as regressions if ``check_time``.
+    """
+    regressions = []
+    print(f'{"benchmark":<32} {"time (ms)":>12} {"calls":>10} {"base (ms)":>12} {"base calls":>11}')
+    for name, result in results.items():
+        base = baseline.get(name, {})
+        t, calls = result['time'], result['calls']
+        base_t, base_calls = base.get('time'), base.get('calls')
+        status = ''
+        if base_calls is not None and calls is not None and calls > base_calls:
+            status = 'REGRESSION (calls)'
+        elif base_t is not None and t > base_t*tolerance and t - base_t > 1e-3:
+            status = 'REGRESSION (time)' if check_time else 'slower'
+        if status.startswith('REGRESSION'):
+            regressions.append(name)
+        print(f'{name:<32} {t*1e3:>12.3f} {"-" if calls is None else calls:>10} '
+              f'{"-" if base_t is None else f"{base_t*1e3:.3f}":>12} {"-" if base_calls is None else base_calls:>11} {status}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000], help='number of rows')
+    parser.add_argument('--latency', type=float, default=0.0, help='fake latency per bridge call (s)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per benchmark (best is kept)')
+    parser.add_argument('--real', action='store_true', help='run against a headless libreoffice')
+    parser.add_argument('--baseline', type=Path, default=here / 'baseline.json')
+    parser.add_argument('--save', action='store_true', help='save results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=1.5, help='max time ratio to baseline')
+    parser.add_argument('--check-time', action='store_true', help='fail if slower than the baseline')
+    parser.add_argument('--output', type=Path, help='save results to a json file')
+    args = parser.parse_args()
+
+    backend = Backend(real=args.real, latency=args.latency)
+    results = dict()
+    try:
+        results['connect2Calc'] = bench_connect(backend)
+        for n_rows in args.sizes:
+            for name, prepare in benchmarks(backend, n_rows):
+                t, calls = measure(backend, prepare, repeat=args.repeat)
+                results[f'{name}[{n_rows}]'] = dict(time=t, calls=calls)
+    finally:
+        backend.close()
+
+    key = 'real' if args.real else f'fake[latency={args.latency:g}]'
+    stored = json.loads(args.baseline.read_text()) if args.baseline.exists() else dict()
+    regressions = compare(results, stored.get(key, {}), args.tolerance, check_time=args.check_time)
+
+    if args.output is not None:
+        args.output.write_text(json.dumps(results, indent=1))
+    if args.save:
+        stored[key] = results
+        args.baseline.write_text(json.dumps(stored, indent=1, sort_keys=True))
+        print(f'baseline saved at {args.baseline}')
+    elif regressions:
+        print(f'{len(regressions)} regression(s).')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Latency microbenchmark: TCP socket vs named pipe transport.
+
+With libreoffice installed, a headless instance is started for each
+transport and the time of one UNO round trip (``cell.getFormula()``) is
+measured. With ``--raw`` (or without libreoffice), only the transports are
+compared: a small message is echoed through a TCP loopback socket and through
+a unix domain socket (which is what a UNO pipe uses on unix)::
+
+    python benchmarks/bench_transport.py
+    python benchmarks/bench_transport.py --raw --calls 20000
+"""
+
+# standard imports
+import argparse
+import os
+import shutil
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+here = Path(__file__).resolve().parent
+sys.path.insert(0, str(here.parent))
+
+import pyCalc
+
+
+def _summary(name, times):
+    times = sorted(times)
+    print(f'{name:<8} {statistics.median(times)*1e6:>10.1f} us/call (median)  '
+          f'{times[len(times)//10]*1e6:>8.1f} (p10)  {times[len(times)*9//10]*1e6:>8.1f} (p90)')
+    return statistics.median(times)
+
+
+def bench_office(calls, port=8100):
+    """Median time (s) of one UNO round trip for each transport."""
+    results = dict()
+    for name, pipe in (('socket', None), ('pipe', True)):
+        with tempfile.TemporaryDirectory(prefix='pyCalc_bench_') as profile:
+            calcObject = pyCalc.connect2Calc(port=port, headless=True, profile=profile, pipe=pipe)
+            try:
+                cell = calcObject.get_sheet_by_index(0).get_cell_by_position(0, 0)
+                for _ in range(100):  # warm up
+                    cell.getFormula()
+                times = []
+                for _ in range(calls):
+                    t0 = time.perf_counter()
+                    cell.getFormula()
+                    times.append(time.perf_counter() - t0)
+                results[name] = _summary(name, times)
+            finally:
+                pyCalc.shutdown_libreoffice(calcObject)
+    return results
+
+
+def _echo_server(listener):
+    connection, address = listener.accept()
+    with connection:
+        while True:
+            data = connection.recv(64)
+            if not data:
+                return
+            connection.sendall(data)
+
+
+def _ping(family, address, calls):
+    listener = socket.socket(family, socket.SOCK_STREAM)
+    listener.bind(address)
+    listener.listen()
+    thread = threading.Thread(target=_echo_server, args=(listener, ), daemon=True)
+    thread.start()
+    client = socket.socket(family, socket.SOCK_STREAM)
+    client.connect(listener.getsockname())
+    if family == socket.AF_INET:
+        client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    times = []
+    try:
+        for i in range(calls + 100):
+            t0 = time.perf_counter()
+            client.sendall(b'x'*32)
+            client.recv(64)
+            if i >= 100:  # warm up
+                times.append(time.perf_counter() - t0)
+    finally:
+        client.close()
+        thread.join()
+        listener.close()
+    return times
+
+
+def bench_raw(calls):
+    """Median time (s) of one echo round trip for each transport."""
+    results = dict()
+    results['socket'] = _summary('socket', _ping(socket.AF_INET, ('localhost', 0), calls))
+    if hasattr(socket, 'AF_UNIX'):
+        with tempfile.TemporaryDirectory() as folder:
+            results['pipe'] = _summary('pipe', _ping(socket.AF_UNIX, os.path.join(folder, 'pipe'), calls))
+    else:
+        print('pipe     unix domain sockets are not available')
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=5000, help='round trips per transport')
+    parser.add_argument('--raw', action='store_true', help='compare transports only (no libreoffice)')
+    parser.add_argument('--port', type=int, default=8100)
+    args = parser.parse_args()
+
+    if not args.raw and shutil.which('soffice') is None:
+        print('soffice not found, comparing transports only (--raw).')
+        args.raw = True
+    results = bench_raw(args.calls) if args.raw else bench_office(args.calls, port=args.port)
+    if 'socket' in results and 'pipe' in results:
+        print(f'pipe/socket: {results["pipe"]/results["socket"]:.2f}')
+
+
+if __name__ == '__main__':
+    main()
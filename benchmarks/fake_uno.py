@@ -0,0 +1,427 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Local stand-in for the UNO objects used by pyCalc.
+
+Every method call on these objects counts as one bridge call (one UNO round
+trip) and takes ``latency`` seconds, so the number of round trips made by the
+pyCalc helpers can be measured without libreoffice.
+
+If the ``uno``/``unotools`` modules are not installed, :py:func:`install`
+registers minimal stand-in modules, so pyCalc can be imported.
+"""
+
+# standard imports
+import sys
+import time
+import types
+from collections import Counter
+
+
+class Bridge(object):
+    """Counts calls and simulates the latency of each call.
+
+    Args:
+        latency (float, optional): time (in seconds) of each call.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+        self.by_method = Counter()
+
+    def call(self, name):
+        self.calls += 1
+        self.by_method[name] += 1
+        if self.latency > 0:
+            end = time.perf_counter() + self.latency
+            while time.perf_counter() < end:
+                pass
+
+    def reset(self):
+        self.calls = 0
+        self.by_method = Counter()
+
+
+bridge = Bridge()
+
+
+class Struct(object):
+    """UNO struct (CellAddress, CellRangeAddress, PropertyValue, ...)."""
+
+    _fields = {'com.sun.star.table.CellRangeAddress': ('Sheet', 'StartColumn', 'StartRow', 'EndColumn', 'EndRow'),
+               'com.sun.star.table.CellAddress': ('Sheet', 'Column', 'Row'),
+               'com.sun.star.beans.PropertyValue': ('Name', 'Handle', 'Value', 'State'),
+              }
+
+    def __init__(self, typeName='', *args, **kwargs):
+        self.typeName = typeName
+        self.__dict__.update(zip(self._fields.get(typeName, ()), args))
+        self.__dict__.update(kwargs)
+
+    def __repr__(self):
+        return f'({self.typeName}){self.__dict__}'
+
+
+class _Object(object):
+    """Base class: calls to public methods are counted by the bridge."""
+
+    def __getattribute__(self, name):
+        attr = object.__getattribute__(self, name)
+        if not name.startswith('_') and callable(attr):
+            object.__getattribute__(self, '_bridge').call(f'{type(self).__name__}.{name}')
+        return attr
+
+
+class CellRange(_Object):
+
+    def __init__(self, sheet, col_init, row_init, col_final, row_final):
+        self._bridge = sheet._bridge
+        self._sheet = sheet
+        self._box = (col_init, row_init, col_final, row_final)
+
+    def _cells(self):
+        c0, r0, c1, r1 = self._box
+        return [[(col, row) for col in range(c0, c1+1)] for row in range(r0, r1+1)]
+
+    def _data(self, cell):
+        value = self._sheet._cells.get(cell, '')
+        if isinstance(value, str) and value.startswith('='):
+            return 0.0
+        return value
+
+    def _formula(self, cell):
+        value = self._sheet._cells.get(cell, '')
+        if isinstance(value, float):
+            return str(int(value)) if value.is_integer() else repr(value)
+        return value
+
+    def _set(self, data, formula):
+        self._sheet._doc._modified = True
+        for row in zip(self._cells(), data):
+            for cell, value in zip(*row):
+                if formula and isinstance(value, str) and not value.startswith('='):
+                    try:
+                        value = float(value)
+                    except ValueError:
+                        pass
+                if value == '':
+                    self._sheet._cells.pop(cell, None)
+                else:
+                    self._sheet._cells[cell] = value
+
+    def getDataArray(self):
+        return tuple(tuple(self._data(cell) for cell in row) for row in self._cells())
+
+    def getFormulaArray(self):
+        return tuple(tuple(self._formula(cell) for cell in row) for row in self._cells())
+
+    def setDataArray(self, data):
+        self._set(data, formula=False)
+
+    def setFormulaArray(self, data):
+        self._set(data, formula=True)
+
+    def getPropertyValue(self, name):
+        return self._sheet._props.get((self._box[0], self._box[1]), {}).get(name, 0)
+
+    def getPropertyValues(self, names):
+        props = self._sheet._props.get((self._box[0], self._box[1]), {})
+        return tuple(props.get(name, 0) for name in names)
+
+    def setPropertyValue(self, name, value):
+        for row in self._cells():
+            for cell in row:
+                self._sheet._props.setdefault(cell, {})[name] = value
+
+    def setPropertyValues(self, names, values):
+        for row in self._cells():
+            for cell in row:
+                self._sheet._props.setdefault(cell, {}).update(zip(names, values))
+
+    def getRangeAddress(self):
+        c0, r0, c1, r1 = self._box
+        return Struct('com.sun.star.table.CellRangeAddress', self._sheet._index, c0, r0, c1, r1)
+
+    def queryContentCells(self, flags):
+        c0, r0, c1, r1 = self._box
+        cells = [cell for cell in self._sheet._cells if c0 <= cell[0] <= c1 and r0 <= cell[1] <= r1]
+        addresses = [Struct('com.sun.star.table.CellRangeAddress', self._sheet._index, c, r, c, r) for c, r in cells]
+        return CellRanges(self._sheet._doc, addresses)
+
+
+class Cell(CellRange):
+
+    def __init__(self, sheet, col, row):
+        CellRange.__init__(self, sheet, col, row, col, row)
+
+    def getFormula(self):
+        return self._formula(self._box[:2])
+
+    def getString(self):
+        value = self._data(self._box[:2])
+        return self._formula(self._box[:2]) if isinstance(value, float) else value
+
+    def setFormula(self, value):
+        self._set(((value, ), ), formula=True)
+
+    def setString(self, value):
+        self._set(((str(value), ), ), formula=False)
+
+    def getCellAddress(self):
+        return Struct('com.sun.star.table.CellAddress', self._sheet._index, *self._box[:2])
+
+
+class CellRanges(_Object):
+    """SheetCellRanges container."""
+
+    def __init__(self, doc, addresses=()):
+        self._bridge = doc._bridge
+        self._doc = doc
+        self._addresses = list(addresses)
+
+    def addRangeAddresses(self, addresses, merge):
+        self._addresses += list(addresses)
+
+    def getRangeAddresses(self):
+        return tuple(self._addresses)
+
+    def setPropertyValue(self, name, value):
+        for a in self._addresses:
+            sheet = self._doc._sheets[a.Sheet]
+            for row in range(a.StartRow, a.EndRow+1):
+                for col in range(a.StartColumn, a.EndColumn+1):
+                    sheet._props.setdefault((col, row), {})[name] = value
+
+
+class _Line(_Object):
+    """Column or row."""
+
+    def __init__(self, sheet, sizes, index, name):
+        self._bridge = sheet._bridge
+        self._sizes = sizes
+        self._index = index
+        self._name = name
+
+    @property
+    def Width(self):
+        self._bridge.call('Column.Width')
+        return self._sizes.get(self._index, 2258)
+
+    @property
+    def Height(self):
+        self._bridge.call('Row.Height')
+        return self._sizes.get(self._index, 452)
+
+    def setPropertyValue(self, name, value):
+        self._sizes[self._index] = value
+
+
+class _Lines(_Object):
+
+    def __init__(self, sheet, sizes, name):
+        self._bridge = sheet._bridge
+        self._sheet = sheet
+        self._sizes = sizes
+        self._name = name
+
+    def __getitem__(self, index):
+        self._bridge.call(f'{self._name}s.getByIndex')
+        return _Line(self._sheet, self._sizes, index, self._name)
+
+
+class Cursor(_Object):
+
+    def __init__(self, sheet):
+        self._bridge = sheet._bridge
+        self._sheet = sheet
+
+    def gotoEndOfUsedArea(self, expand):
+        pass
+
+    def getRangeAddress(self):
+        cells = self._sheet._cells
+        last_col = max((col for col, row in cells), default=0)
+        last_row = max((row for col, row in cells), default=0)
+        return Struct('com.sun.star.table.CellRangeAddress', self._sheet._index, 0, 0, last_col, last_row)
+
+
+class Sheet(_Object):
+    """Spreadsheet (with the unotools helper methods used by pyCalc)."""
+
+    def __init__(self, doc, name, index):
+        self._bridge = doc._bridge
+        self._doc = doc
+        self._name = name
+        self._index = index
+        self._cells = dict()
+        self._props = dict()
+        self._widths = dict()
+        self._heights = dict()
+
+    def get_cell_range_by_position(self, col_init, row_init, col_final, row_final):
+        return CellRange(self, col_init, row_init, col_final, row_final)
+
+    def getCellRangeByPosition(self, col_init, row_init, col_final, row_final):
+        return CellRange(self, col_init, row_init, col_final, row_final)
+
+    def get_cell_by_position(self, col, row):
+        return Cell(self, col, row)
+
+    def getCellByPosition(self, col, row):
+        return Cell(self, col, row)
+
+    def createCursor(self):
+        return Cursor(self)
+
+    def getColumns(self):
+        return _Lines(self, self._widths, 'Column')
+
+    def getRows(self):
+        return _Lines(self, self._heights, 'Row')
+
+    def getName(self):
+        return self._name
+
+    def setName(self, name):
+        self._name = name
+
+    def getRangeAddress(self):
+        return Struct('com.sun.star.table.CellRangeAddress', self._index, 0, 0, 1023, 1048575)
+
+    def copyRange(self, destination, source):
+        sheet = self._doc._sheets[source.Sheet]
+        for row in range(source.StartRow, source.EndRow+1):
+            for col in range(source.StartColumn, source.EndColumn+1):
+                target = (destination.Column + col - source.StartColumn, destination.Row + row - source.StartRow)
+                if (col, row) in sheet._cells:
+                    self._cells[target] = sheet._cells[(col, row)]
+                if (col, row) in sheet._props:
+                    self._props[target] = dict(sheet._props[(col, row)])
+
+
+class _Sheets(_Object):
+
+    def __init__(self, doc):
+        self._bridge = doc._bridge
+        self._doc = doc
+
+    @property
+    def ElementNames(self):
+        self._bridge.call('Sheets.ElementNames')
+        return tuple(sheet._name for sheet in self._doc._sheets)
+
+    def getByIndex(self, index):
+        return self._doc._sheets[index]
+
+    def getByName(self, name):
+        return self._doc.get_sheet_by_name(name)
+
+    def _insert(self, source, name, position):
+        sheet = Sheet(self._doc, name, position)
+        for attr in ('_cells', '_props', '_widths', '_heights'):
+            setattr(sheet, attr, {key: dict(value) if isinstance(value, dict) else value
+                                  for key, value in getattr(source, attr).items()})
+        self._doc._sheets.insert(position, sheet)
+        for index, item in enumerate(self._doc._sheets):
+            item._index = index
+        return position
+
+    def copyByName(self, name, new_name, position):
+        self._insert(self._doc.get_sheet_by_name(name), new_name, position)
+
+    def importSheet(self, doc, name, position):
+        return self._insert(doc.get_sheet_by_name(name), name, position)
+
+    def getCount(self):
+        return len(self._doc._sheets)
+
+
+class Calc(_Object):
+    """Calc document (as created by unotools)."""
+
+    def __init__(self, context=None, url=None, bridge=None, sheets=('Sheet1', )):
+        if bridge is None:
+            bridge = globals()['bridge']
+        self._bridge = bridge
+        self._sheets = [Sheet(self, name, i) for i, name in enumerate(sheets)]
+        self.Location = '' if url is None else url
+        self._automatic = True
+        self._modified = False
+
+    @property
+    def Sheets(self):
+        return _Sheets(self)
+
+    def get_sheet_by_name(self, name):
+        for sheet in self._sheets:
+            if sheet._name == name:
+                return sheet
+        raise KeyError(name)
+
+    def get_sheet_by_index(self, index):
+        return self._sheets[index]
+
+    def createInstance(self, name):
+        if name == 'com.sun.star.sheet.SheetCellRanges':
+            return CellRanges(self)
+        raise ValueError(name)
+
+    def isModified(self):
+        return self._modified
+
+    def isAutomaticCalculationEnabled(self):
+        return self._automatic
+
+    def enableAutomaticCalculation(self, value):
+        self._automatic = value
+
+    def lockControllers(self):
+        pass
+
+    def unlockControllers(self):
+        pass
+
+    def addActionLock(self):
+        pass
+
+    def removeActionLock(self):
+        pass
+
+    def calculate(self):
+        pass
+
+    def close(self, deliver):
+        pass
+
+
+def install():
+    """Register stand-in ``uno`` and ``unotools`` modules if they are missing.
+
+    Returns:
+        True if stand-in modules were installed.
+    """
+    try:
+        import uno
+        import unotools
+        return False
+    except ImportError:
+        pass
+
+    uno = types.ModuleType('uno')
+    uno.createUnoStruct = Struct
+    uno.Enum = lambda typeName, value: Struct(typeName, value=value)
+    uno.fileUrlToSystemPath = lambda url: url[len('file://'):]
+
+    unotools = types.ModuleType('unotools')
+    unotools.Socket = lambda host='localhost', port=2002: Struct('Socket', host=host, port=port)
+    unotools.Pipe = lambda name: Struct('Pipe', name=name)
+    unotools.connect = lambda connection, **kwargs: Struct('Context', connection=connection)
+    component = types.ModuleType('unotools.component')
+    calc = types.ModuleType('unotools.component.calc')
+    calc.Calc = Calc
+    unohelper = types.ModuleType('unotools.unohelper')
+    unohelper.convert_path_to_url = lambda path: 'file://' + path
+
+    sys.modules.update({'uno': uno, 'unotools': unotools, 'unotools.component': component,
+                        'unotools.component.calc': calc, 'unotools.unohelper': unohelper})
+    return True
@@ -3,23 +3,286 @@
 """Support function for connecting with libreoffice Calc."""
 
 # standard imports
-import numpy as np
+import atexit
+import datetime
+import fnmatch
+import functools
+import hashlib
+import importlib
+import json
 from pathlib import Path
 import os
-import inspect
-import psutil
-import signal
+import queue
+import re
+import shutil
+import socket
+import sys
 import subprocess
+import tempfile
+import threading
 import time
 import warnings
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
 
-# import uno
-from unotools import Socket, connect
-from unotools.component.calc import Calc
-from unotools.unohelper import convert_path_to_url
+
+# heavy modules are imported on first use, so `import pyCalc` stays fast
+class _LazyModule(object):
+    """Module that is imported on first attribute access.
+
+    Once imported, the global name is bound to the module itself.
+    """
+
+    def __init__(self, name, alias):
+        self.__dict__['_name'] = name
+        self.__dict__['_alias'] = alias
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self._name)
+        if globals().get(self._alias) is self:
+            globals()[self._alias] = module
+        return getattr(module, attr)
+
+    def __repr__(self):
+        return f'<lazy module {self._name!r}>'
+
+
+def _lazy_function(module, name):
+    """Function (or class) that is imported on first call."""
+    def function(*args, **kwargs):
+        obj = getattr(importlib.import_module(module), name)
+        if globals().get(name) is function:
+            globals()[name] = obj
+        return obj(*args, **kwargs)
+    function.__name__ = function.__qualname__ = name
+    return function
+
+
+np = _LazyModule('numpy', 'np')
+psutil = _LazyModule('psutil', 'psutil')
+asyncio = _LazyModule('asyncio', 'asyncio')
+futures = _LazyModule('concurrent.futures', 'futures')
+zipfile = _LazyModule('zipfile', 'zipfile')
+ElementTree = _LazyModule('xml.etree.ElementTree', 'ElementTree')
+
+uno = _LazyModule('uno', 'uno')
+Socket = _lazy_function('unotools', 'Socket')
+Pipe = _lazy_function('unotools', 'Pipe')
+connect = _lazy_function('unotools', 'connect')
+Calc = _lazy_function('unotools.component.calc', 'Calc')
+convert_path_to_url = _lazy_function('unotools.unohelper', 'convert_path_to_url')
 
 # calcObject (xlsx)
-def connect2Calc(file=None, port=8100, counter_max=5000):
+def _start_soffice(port=8100, headless=False, profile=None, detach=False, pipe=None):
+    """Start a libreoffice process listening on a socket (or a named pipe).
+
+    Args:
+        port (int, optional): port for connection.
+        headless (bool, optional): if True, libreoffice runs without GUI.
+        profile (str or pathlib.Path, optional): user profile folder. Use
+            different folders to run more than one instance at the same time.
+            If None, the default user profile is used.
+        detach (bool, optional): if True, libreoffice runs in its own session,
+            so it keeps running after python exits.
+        pipe (str, optional): if given, libreoffice listens on the named pipe
+            ``pipe`` instead of the port.
+
+    Returns:
+        Popen object. The process is recorded in the registry of owned
+        processes (see :py:func:`shutdown_libreoffice`). Headless processes
+        that are not detached are closed when python exits.
+    """
+    if pipe is None:
+        args = ['soffice', '--nodefault', f'--accept=socket,host=localhost,port={port};urp;']
+    else:
+        args = ['soffice', '--nodefault', f'--accept=pipe,name={pipe};urp;']
+    if headless:
+        args += ['--headless', '--norestore']
+    if profile is not None:
+        args.append('-env:UserInstallation=' + Path(profile).resolve().as_uri())
+    process = subprocess.Popen(args, close_fds=True, start_new_session=detach)
+    with _owned_lock:
+        _owned[process.pid] = dict(process=process, context=None, port=port, pipe=pipe, profile=profile,
+                                   at_exit=headless and not detach)
+    return process
+
+
+def _port_open(host, port, timeout=0.1):
+    """Return True if something is accepting connections at host:port."""
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def _pipe_name(pipe=True):
+    """Return the pipe name, or a unique pipe name if pipe is True."""
+    if pipe is True:
+        return f'pyCalc_{os.getpid()}_{os.urandom(4).hex()}'
+    return pipe or None
+
+
+def _format_times(times):
+    return ', '.join(f'{phase}: {t:.3f} s' for phase, t in times.items())
+
+
+def _connect_context(port=8100, process=None, timeout=60, counter_max=5000, times=None, pipe=None):
+    """Wait for a libreoffice instance to be ready and connect to it.
+
+    Startup is done in two phases. First, the port is probed with a plain
+    socket, which is cheap. Then, the UNO bridge is established. The delay
+    between tentatives starts at 10 ms and grows up to 0.5 s. With a named
+    pipe, there is only the second phase.
+
+    Args:
+        port (int, optional): port for connection.
+        process (Popen object, optional): libreoffice process. If given, it
+            raises an error as soon as the process exits.
+        timeout (float, optional): max time (in seconds) to wait.
+        counter_max (int, optional): Max number of tentatives to establish a
+            connection.
+        times (dict, optional): if given, the time (in seconds) spent waiting
+            for the port ('socket') and for the UNO bridge ('bridge') is
+            written to it.
+        pipe (str, optional): if given, it connects through this named pipe
+            instead of the port.
+
+    Returns:
+        UNO component context.
+
+    Raises:
+        ConnectionError: if the connection cannot be established.
+    """
+    if times is None:
+        times = dict()
+    where = f'port {port}' if pipe is None else f'pipe {pipe}'
+    phase = 'socket' if pipe is None else 'bridge'
+    t_phase = time.perf_counter()
+    deadline = t_phase + timeout
+    delay = 0.01
+    counter = 0
+    last_error = None
+    while True:
+        if process is not None and process.poll() is not None:
+            times[phase] = time.perf_counter() - t_phase
+            raise ConnectionError(f'libreoffice exited with code {process.returncode} during startup '
+                                  f'({where}; {_format_times(times)}).')
+
+        if phase == 'socket':
+            if _port_open('localhost', port):
+                times[phase] = time.perf_counter() - t_phase
+                phase = 'bridge'
+                t_phase = time.perf_counter()
+                delay = 0.01
+                continue
+        else:
+            try:
+                context = connect(Socket('localhost', port) if pipe is None else Pipe(pipe))
+                times[phase] = time.perf_counter() - t_phase
+                if process is not None and process.pid in _owned:
+                    _owned[process.pid]['context'] = context
+                return context
+            except Exception as e:
+                last_error = e
+
+        counter += 1
+        now = time.perf_counter()
+        if counter >= counter_max or now >= deadline:
+            times[phase] = now - t_phase
+            message = f'Cannot establish connection at {where}, stuck waiting for {phase} ({_format_times(times)}).'
+            if last_error is not None:
+                message += f' Last error: {last_error!r}.'
+            raise ConnectionError(message + ' Maybe try increasing timeout or counter_max value.')
+        time.sleep(min(delay, deadline - now))
+        delay = min(delay*1.5, 0.5)
+
+
+# pid: dict(process, context, port, pipe, profile, at_exit) of processes started here
+_owned = dict()
+_owned_lock = threading.RLock()
+
+
+def _process_tree(pid):
+    """Return a process and all its children (psutil.Process objects)."""
+    try:
+        proc = psutil.Process(pid)
+        return [proc] + proc.children(recursive=True)
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return []
+
+
+def _stop_processes(procs, timeout=10, wait=True):
+    """Wait for processes to exit, then send SIGTERM, and then SIGKILL.
+
+    Each step waits up to ``timeout`` seconds. If ``wait=False``, SIGTERM is
+    sent right away.
+
+    Returns:
+        list of processes that could not be stopped.
+    """
+    alive = procs
+    if wait:
+        gone, alive = psutil.wait_procs(procs, timeout=timeout)
+    for method in ('terminate', 'kill'):
+        if not alive:
+            break
+        for proc in alive:
+            try:
+                getattr(proc, method)()
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+        gone, alive = psutil.wait_procs(alive, timeout=timeout)
+    return [proc for proc in alive if not _zombie(proc)]
+
+
+def _zombie(proc):
+    try:
+        return proc.status() == psutil.STATUS_ZOMBIE
+    except psutil.Error:
+        return True
+
+
+def _terminate_soffice(context, process, timeout=10):
+    """Close a libreoffice instance started by :py:func:`_start_soffice`.
+
+    The office is asked to terminate through UNO. Processes still running after
+    ``timeout`` seconds get SIGTERM, and then SIGKILL.
+    """
+    procs = [] if process is None else _process_tree(process.pid)
+    if context is not None:
+        try:
+            desktop = context.ServiceManager.createInstanceWithContext('com.sun.star.frame.Desktop', context)
+            desktop.terminate()
+        except Exception:
+            pass
+    if process is not None:
+        alive = _stop_processes(procs, timeout=timeout, wait=context is not None)
+        if alive:
+            warnings.warn(f'Cannot stop libreoffice processes: {[proc.pid for proc in alive]}')
+        process.poll()
+        with _owned_lock:
+            _owned.pop(process.pid, None)
+
+
+def _open_calc(context, file=None):
+    """Open a file (or a new document) in a connected libreoffice instance.
+
+    Returns:
+        Calc object (instrumented if profiling is on, see :py:func:`profile`).
+    """
+    if file is None:
+        calcObject = Calc(context)
+    else:
+        calcObject = Calc(context, convert_path_to_url(str(Path(file))))
+    if _profiler is not None:
+        calcObject = _profiler.wrap(calcObject)
+    return calcObject
+
+
+def connect2Calc(file=None, port=8100, counter_max=5000, headless=False, profile=None,
+                 timeout=60, timing=False, lazy=False, pipe=None):
     """Open libreoffice and enable conection with Calc.
 
     Args:
@@ -28,9 +291,28 @@ def connect2Calc(file=None, port=8100, counter_max=5000):
         port (int, optional): port for connection.
         counter_max (int, optional): Max number of tentatives to establish a
             connection.
+        headless (bool, optional): if True, libreoffice runs without GUI.
+        profile (str or pathlib.Path, optional): user profile folder. Use
+            different folders (and ports) to run more than one instance at the
+            same time.
+        timeout (float, optional): max time (in seconds) to wait for
+            libreoffice to start.
+        timing (bool, optional): if True, it also returns a dict with the time
+            (in seconds) spent in each startup phase: 'spawn', 'socket',
+            'bridge', 'document', and 'total'.
+        lazy (bool, optional): if True, libreoffice is started only when the
+            Calc object is first used (see :py:class:`LazyCalc`). The timing
+            dict is then available as ``calcObject.times`` after startup.
+        pipe (bool or str, optional): if given, libreoffice is connected
+            through a named pipe instead of a TCP socket, which has a lower
+            latency per call. If True, a unique pipe name is generated, so
+            several instances can run at the same time. port is not used.
 
     Returns:
-        Calc object.
+        Calc object (and timing dict, if ``timing=True`` and not lazy).
+
+        If profiling is on (see :py:func:`profile`), the Calc object and every
+        object obtained from it count and time their UNO calls.
 
         The main mathods defined for a Calc object are exemplyfied below:
 
@@ -51,28 +333,81 @@ def connect2Calc(file=None, port=8100, counter_max=5000):
 
         Also, use :py:func:`~backpack.figmanip.setFigurePosition`
     """
+    if lazy:
+        return LazyCalc(file, port=port, counter_max=counter_max, headless=headless, profile=profile,
+                        timeout=timeout, pipe=pipe)
+
+    times = dict()
+    t0 = time.perf_counter()
+
     # open libreoffice
-    libreoffice = subprocess.Popen([f"soffice --nodefault --accept='socket,host=localhost,port={port};urp;'"], shell=True, close_fds=True)
+    pipe = _pipe_name(pipe)
+    libreoffice = _start_soffice(port, headless=headless, profile=profile, pipe=pipe)
+    times['spawn'] = time.perf_counter() - t0
 
     # connect to libreoffice
-    connected = False
-    counter = 0
-    while connected == False:
-        time.sleep(0.5)
-        try:
-            context = connect(Socket('localhost', 8100))
-            connected = True
-        except:
-            counter += 1
-            if counter == counter_max:
-                raise ConnectionError('Cannot establish connection, maybe try increasing counter_max value.')
-            pass
+    context = _connect_context(port, process=libreoffice, timeout=timeout, counter_max=counter_max, times=times,
+                               pipe=pipe)
 
-    if file is None:
-        return Calc(context)
-    else:
-        file = Path(file)
-        return Calc(context, convert_path_to_url(str(file)))
+    t1 = time.perf_counter()
+    calcObject = _open_calc(context, file)
+    try:
+        _documents[calcObject] = libreoffice.pid
+    except TypeError:
+        pass
+    times['document'] = time.perf_counter() - t1
+    times['total'] = time.perf_counter() - t0
+
+    if timing:
+        return calcObject, times
+    return calcObject
+
+
+class LazyCalc(object):
+    """Calc object that starts libreoffice on first use.
+
+    Created by ``connect2Calc(..., lazy=True)``. Attributes and methods are
+    forwarded to the Calc object, which is created (with
+    :py:func:`connect2Calc`) on the first access. Closing a LazyCalc that was
+    never used does not start libreoffice.
+
+    Args:
+        file (str or pathlib.Path, optional): file to connect.
+        **kwargs: arguments of :py:func:`connect2Calc`.
+    """
+
+    def __init__(self, file=None, **kwargs):
+        self.__dict__.update(_file=file, _kwargs=kwargs, _calcObject=None, _lock=threading.Lock(), times=None)
+
+    @property
+    def connected(self):
+        """True if libreoffice was started."""
+        return self._calcObject is not None
+
+    def connect(self):
+        """Start libreoffice (if not started yet) and return the Calc object."""
+        with self._lock:
+            if self._calcObject is None:
+                calcObject, self.__dict__['times'] = connect2Calc(self._file, timing=True, **self._kwargs)
+                try:
+                    _documents[self] = _documents.get(calcObject)
+                except TypeError:
+                    pass
+                self.__dict__['_calcObject'] = calcObject
+        return self._calcObject
+
+    def close(self, deliver=True):
+        if self._calcObject is not None:
+            self._calcObject.close(deliver)
+
+    def __getattr__(self, name):
+        return getattr(self.connect(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.connect(), name, value)
+
+    def __repr__(self):
+        return f'<LazyCalc {"connected" if self.connected else "not started"}>'
 
 
 def closeCalc(calcObject):
@@ -85,67 +420,662 @@ def closeCalc(calcObject):
     return
 
 
-def _findProcessIdByName(string):
-    """Get a list of all the PIDs of all the running process whose name contains
-    string.
+def _findProcessIdByName(*strings, user=None):
+    """Get a list of all the running processes whose name contains any of
+    strings.
+
+    The process table is read once, with the attributes prefetched.
 
     Args:
-        string (str): string.
-    """
+        *strings (str): strings.
+        user (str, optional): if given, only processes of this user are
+            returned.
 
+    Returns:
+        list of dicts with keys 'pid', 'name', 'username', and 'create_time'.
+    """
+    strings = [string.lower() for string in strings]
     listOfProcessObjects = []
+    for proc in psutil.process_iter(attrs=['pid', 'name', 'username', 'create_time']):
+        pinfo = proc.info
+        name = (pinfo['name'] or '').lower()
+        if any(string in name for string in strings):
+            if user is None or pinfo['username'] == user:
+                listOfProcessObjects.append(pinfo)
+    return listOfProcessObjects
 
-    # Iterate over the all the running process
-    for proc in psutil.process_iter():
-       try:
-           pinfo = proc.as_dict(attrs=['pid', 'name', 'create_time'])
-           # Check if process name contains the given name string.
-           if string.lower() in pinfo['name'].lower() :
-               listOfProcessObjects.append(pinfo)
-       except (psutil.NoSuchProcess, psutil.AccessDenied , psutil.ZombieProcess):
-           pass
-
-    return listOfProcessObjects;
 
-
-def _libreoffice_processes():
+def _libreoffice_processes(user=None):
     """Return a list of processes associated with libreoffice.
 
+    Args:
+        user (str, optional): if given, only processes of this user are
+            returned.
+
     Note:
         This function try to match the name of a process with names tipically
         related with libreoffice processes ('soffice.bin' or 'oosplash').
         Therefore, it might return processes that are not related to
         libreoffice if their name mathces with words: 'soffice.bin'
         and 'oosplash'."""
-    process_list = []
-    for proc in _findProcessIdByName('soffice'):
-        process_list.append(proc)
-    for proc in _findProcessIdByName('oosplash'):
-        process_list.append(proc)
-    return process_list
+    return _findProcessIdByName('soffice', 'oosplash', user=user)
+
+
+# calcObject: pid of the libreoffice process started by connect2Calc
+_documents = weakref.WeakKeyDictionary()
+
 
+def shutdown_libreoffice(calcObject=None, timeout=10):
+    """Close libreoffice processes started by this python process.
 
-def kill_libreoffice_processes():
+    Only processes started by pyCalc (:py:func:`connect2Calc`,
+    :py:class:`CalcPool`, ...) are closed. Each office is asked to terminate.
+    Processes (and their children) still running after ``timeout`` seconds get
+    SIGTERM, and then SIGKILL.
+
+    Args:
+        calcObject (Calc object, optional): if given, only the libreoffice
+            process started by :py:func:`connect2Calc` for this object is
+            closed.
+        timeout (float, optional): time (in seconds) to wait at each step.
+    """
+    with _owned_lock:
+        if calcObject is None:
+            pids = list(_owned)
+        else:
+            pids = [_documents.get(calcObject)]
+        entries = [_owned[pid] for pid in pids if pid in _owned]
+    for entry in entries:
+        _terminate_soffice(entry['context'], entry['process'], timeout=timeout)
+
+
+def _shutdown_at_exit():
+    with _owned_lock:
+        entries = [entry for entry in _owned.values() if entry['at_exit']]
+    for entry in entries:
+        _terminate_soffice(entry['context'], entry['process'], timeout=5)
+
+
+atexit.register(_shutdown_at_exit)
+
+
+def kill_libreoffice_processes(all=False, timeout=10):
     """Kill libreoffice processes.
 
+    Args:
+        all (bool, optional): if False, only processes started by this python
+            process are closed (see :py:func:`shutdown_libreoffice`). If True,
+            all libreoffice processes of the current user are stopped
+            (SIGTERM, then SIGKILL after ``timeout`` seconds).
+        timeout (float, optional): time (in seconds) to wait at each step.
+
     Note:
-        It will close ALL processes that are related to libreoffice (processes
-        that have 'soffice.bin' or 'oosplash' in their name)."""
+        With ``all=True``, it will close ALL processes of the current user
+        that are related to libreoffice (processes that have 'soffice.bin' or
+        'oosplash' in their name)."""
+    if not all:
+        shutdown_libreoffice(timeout=timeout)
+        return
+
+    procs = []
+    for pinfo in _libreoffice_processes(user=psutil.Process().username()):
+        try:
+            proc = psutil.Process(pinfo['pid'])
+            if proc.create_time() == pinfo['create_time']:
+                procs.append(proc)
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+    alive = _stop_processes(procs, timeout=timeout, wait=False)
+    if alive:
+        warnings.warn(f'Cannot stop libreoffice processes: {[proc.pid for proc in alive]}')
+    with _owned_lock:
+        for pid in [pid for pid, entry in _owned.items() if entry['process'].poll() is not None]:
+            _owned.pop(pid)
+
+
+_owner_file = 'pyCalc.owner'
+
+
+def _write_owner(folder):
+    """Mark a temporary profile folder as owned by this python process."""
+    (Path(folder) / _owner_file).write_text(f'{os.getpid()} {psutil.Process().create_time()}')
+
+
+def _owner_alive(folder):
+    try:
+        pid, create_time = (Path(folder) / _owner_file).read_text().split()
+        return psutil.Process(int(pid)).create_time() == float(create_time)
+    except (OSError, ValueError, psutil.NoSuchProcess, psutil.AccessDenied):
+        return False
+
+
+def cleanup_profiles(folder=None, timeout=10):
+    """Remove orphaned temporary profile folders.
+
+    Temporary profile folders (``pyCalc_*``, created by :py:class:`CalcPool`)
+    are orphaned if the python process that created them has exited without
+    removing them, e.g., after a crash. Libreoffice processes still using
+    these folders are stopped before the folders are removed.
+
+    Args:
+        folder (str or pathlib.Path, optional): folder where to look for
+            profile folders. If None, the temp folder is used.
+        timeout (float, optional): time (in seconds) to wait for processes to
+            stop.
+
+    Returns:
+        list of removed folders.
+    """
+    folder = Path(tempfile.gettempdir() if folder is None else folder)
+    orphans = [path for path in folder.glob('pyCalc_*')
+               if (path / _owner_file).exists() and not _owner_alive(path)]
+    if not orphans:
+        return []
+
+    uris = [path.resolve().as_uri() for path in orphans]
+    procs = []
+    for proc in psutil.process_iter(attrs=['cmdline']):
+        cmdline = ' '.join(proc.info['cmdline'] or ())
+        if any(uri in cmdline for uri in uris):
+            procs += _process_tree(proc.pid)
+    alive = _stop_processes(procs, timeout=timeout, wait=False)
+    if alive:
+        warnings.warn(f'Cannot stop libreoffice processes: {[proc.pid for proc in alive]}')
+    for path in orphans:
+        shutil.rmtree(path, ignore_errors=True)
+    return orphans
+
+
+class CalcPool(object):
+    """Pool of headless libreoffice instances.
+
+    Each instance runs in its own process, with its own port and user profile
+    folder, so documents can be processed in parallel.
+
+    Args:
+        n (int, optional): number of libreoffice instances.
+        port (int, optional): port of the first instance. Instance ``i`` uses
+            port ``port + i``.
+        headless (bool, optional): if True, instances run without GUI.
+        profile_dir (str or pathlib.Path, optional): folder where the user
+            profiles are created. If None, a temporary folder is used and
+            removed when the pool is closed.
+        counter_max (int, optional): Max number of tentatives to establish a
+            connection with each instance.
+        timeout (float, optional): max time (in seconds) to wait for each
+            instance to start.
+        pipe (bool, optional): if True, instances are connected through
+            named pipes (with unique names) instead of ports.
+
+    Attributes:
+        startup_times (list): time spent in each startup phase, per instance
+            (see :py:func:`connect2Calc`).
+
+    Example:
+        >>> def job(calcObject, file):
+        ...     sheetObject, parameters = loadCalc('Sheet1', calcObject)
+        ...     return parameters
+        >>>
+        >>> with CalcPool(4) as pool:
+        ...     results = pool.map(job, filelist)
+        >>>
+        >>> # or, by hand
+        >>> with CalcPool(2) as pool:
+        ...     calcObject = pool.checkout('file.ods')
+        ...     ...
+        ...     pool.checkin(calcObject)
+    """
+
+    def __init__(self, n=2, port=8100, headless=True, profile_dir=None, counter_max=5000, timeout=60, pipe=False):
+        self.n = int(n)
+        self.ports = [port + i for i in range(self.n)]
+        self.pipes = [_pipe_name(True) if pipe else None for i in range(self.n)]
+        self.headless = headless
+        self.counter_max = counter_max
+        self.timeout = timeout
+        self.startup_times = []
+
+        self._tempdir = None
+        if profile_dir is None:
+            self._tempdir = tempfile.TemporaryDirectory(prefix='pyCalc_')
+            profile_dir = self._tempdir.name
+            _write_owner(profile_dir)
+        self.profile_dir = Path(profile_dir)
+
+        self._processes = []
+        self._contexts = []
+        self._free = queue.Queue()
+        self._checked_out = dict()
+        self._lock = threading.Lock()
+        self.start()
+
+    def start(self):
+        """Start all instances (started in parallel, then connected)."""
+        for i, port in enumerate(self.ports):
+            profile = self.profile_dir / f'instance{i}'
+            self._processes.append(_start_soffice(port, headless=self.headless, profile=profile, pipe=self.pipes[i]))
+        try:
+            for port, pipe, process in zip(self.ports, self.pipes, self._processes):
+                times = dict()
+                self._contexts.append(_connect_context(port, process=process, timeout=self.timeout,
+                                                       counter_max=self.counter_max, times=times, pipe=pipe))
+                self.startup_times.append(times)
+        except Exception:
+            self.close()
+            raise
+        for i in range(self.n):
+            self._free.put(i)
+
+    def checkout(self, file=None, timeout=None):
+        """Get a Calc object from a free instance.
+
+        Args:
+            file (str or pathlib.Path, optional): file to open. If None, a new
+                Calc document is created.
+            timeout (float, optional): max time (in seconds) to wait for a
+                free instance. If None, waits forever.
+
+        Returns:
+            Calc object. Return it with :py:meth:`checkin`.
+        """
+        try:
+            i = self._free.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError('No free libreoffice instance available.')
+        try:
+            calcObject = _open_calc(self._contexts[i], file)
+        except Exception:
+            self._free.put(i)
+            raise
+        with self._lock:
+            self._checked_out[id(calcObject)] = i
+        return calcObject
+
+    def checkin(self, calcObject, close=True):
+        """Give back a Calc object obtained with :py:meth:`checkout`.
+
+        Args:
+            calcObject (Calc object): Object returned by :py:meth:`checkout`.
+            close (bool, optional): if True, the document is closed.
+        """
+        with self._lock:
+            i = self._checked_out.pop(id(calcObject))
+        try:
+            if close:
+                closeCalc(calcObject)
+        finally:
+            self._free.put(i)
+
+    @contextmanager
+    def calc(self, file=None, timeout=None):
+        """Context manager version of :py:meth:`checkout`/:py:meth:`checkin`."""
+        calcObject = self.checkout(file, timeout=timeout)
+        try:
+            yield calcObject
+        finally:
+            self.checkin(calcObject)
+
+    def map(self, job, files, maxsize=None, report=False):
+        """Run ``job(calcObject, file)`` for each file across the pool.
+
+        Args:
+            job (function): function with signature ``job(calcObject, file)``.
+                The document is closed after the job returns.
+            files (list): list of files (str or pathlib.Path).
+            maxsize (int, optional): max number of pending files in the queue.
+                If None, it is twice the number of instances.
+            report (bool, optional): if True, returns a report for each file
+                instead of the value returned by the job.
+
+        Returns:
+            list with the value returned by each job, in the same order as
+            ``files``. If a job fails, the exception is returned in its place.
+
+            If ``report=True``, each item is a dict with keys 'file',
+            'result', 'error' (None if the job succeeded), and 'time' (time in
+            seconds to open the file, run the job, and close the file).
+        """
+        if maxsize is None:
+            maxsize = 2 * self.n
+        tasks = queue.Queue(maxsize=maxsize)
+        results = dict()
+
+        def worker():
+            while True:
+                task = tasks.get()
+                if task is None:
+                    return
+                idx, file = task
+                t0 = time.perf_counter()
+                result, error = None, None
+                try:
+                    with self.calc(file) as calcObject:
+                        result = job(calcObject, file)
+                except Exception as e:
+                    warnings.warn(f'job failed for {file}: {e!r}')
+                    error = e
+                if report:
+                    results[idx] = dict(file=file, result=result, error=error, time=time.perf_counter()-t0)
+                else:
+                    results[idx] = result if error is None else error
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(self.n)]
+        for thread in threads:
+            thread.start()
+        n_files = 0
+        for idx, file in enumerate(files):
+            tasks.put((idx, file))
+            n_files += 1
+        for _ in threads:
+            tasks.put(None)
+        for thread in threads:
+            thread.join()
+        return [results[idx] for idx in range(n_files)]
+
+    def stack(self, files, sheet, row_init, col_init, row_final, col_final, type='data'):
+        """Read the same range of cells of a sheet from several files.
+
+        Files are opened across the instances of the pool and each range is
+        read with a single call.
+
+        Args:
+            files (list): list of files (str or pathlib.Path).
+            sheet (str or int): sheet name or index.
+            row_init, col_init, row_final, col_final (int): first and last row
+                and column of the range (inclusive).
+            type (str, optional): 'data' or 'formula'.
+
+        Returns:
+            :py:class:`SheetStack` with shape (file, row, col) and files as
+            labels.
+        """
+        def job(calcObject, file):
+            if isinstance(sheet, str):
+                sheetObject = calcObject.get_sheet_by_name(sheet)
+            else:
+                sheetObject = calcObject.get_sheet_by_index(sheet)
+            return read_range_array(sheetObject, row_init, col_init, row_final, col_final, type=type,
+                                    chunk_rows=max(row_final - row_init + 1, 1))
+
+        files = list(files)
+        blocks = self.map(job, files)
+        for file, block in zip(files, blocks):
+            if isinstance(block, Exception):
+                raise block
+        return _stack(blocks, files)
+
+    def close(self):
+        """Close all instances."""
+        for i, process in enumerate(self._processes):
+            context = self._contexts[i] if i < len(self._contexts) else None
+            _terminate_soffice(context, process)
+        self._processes = []
+        self._contexts = []
+        self._free = queue.Queue()
+        if self._tempdir is not None:
+            self._tempdir.cleanup()
+            self._tempdir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class CalcDaemon(object):
+    """Long-lived headless libreoffice instance that stays warm between runs.
+
+    The first call to :py:meth:`start` launches libreoffice detached from
+    python, so it keeps running after the script ends. Later runs (or other
+    processes) using the same port attach to the running instance instead of
+    starting a new one. Documents are opened and closed inside the instance
+    with :py:meth:`open` and :py:meth:`close`.
+
+    If the libreoffice process crashes, it is restarted automatically on the
+    next :py:meth:`open` (or by :py:meth:`watch`/:py:meth:`serve`).
+
+    Args:
+        port (int, optional): port for connection.
+        profile (str or pathlib.Path, optional): user profile folder. If None,
+            a folder named ``pyCalc_daemon_<port>`` in the temp folder is used.
+        timeout (float, optional): max time (in seconds) to wait for
+            libreoffice to start.
+        counter_max (int, optional): Max number of tentatives to establish a
+            connection.
+
+    Example:
+        >>> daemon = CalcDaemon().start()
+        >>> calcObject = daemon.open('file.ods')
+        >>> ...
+        >>> daemon.close(calcObject)
+        >>>
+        >>> # in a terminal, keep an instance warm and healthy
+        >>> # python -c "import pyCalc; pyCalc.CalcDaemon().serve()"
+    """
+
+    def __init__(self, port=8100, profile=None, timeout=60, counter_max=5000):
+        self.port = port
+        if profile is None:
+            profile = Path(tempfile.gettempdir()) / f'pyCalc_daemon_{port}'
+        self.profile = Path(profile)
+        self.timeout = timeout
+        self.counter_max = counter_max
+        self.context = None
+        self.restarts = 0
+        self._process = None
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._watcher = None
+
+    @property
+    def pidfile(self):
+        """File where the pid and create time of the libreoffice process are stored."""
+        return self.profile / 'pyCalc_daemon.pid'
+
+    @property
+    def pid(self):
+        """Pid of the libreoffice process (None if unknown or not verified)."""
+        proc = self._verified_process()
+        return None if proc is None else proc.pid
+
+    def _verified_process(self):
+        """Return the libreoffice process (psutil.Process), or None.
+
+        The pidfile may be left by an instance that died, and its pid reused
+        by an unrelated process, so the process is only returned if its create
+        time matches the one in the pidfile.
+        """
+        try:
+            pid, create_time = self.pidfile.read_text().split()
+            proc = psutil.Process(int(pid))
+            if proc.create_time() == float(create_time):
+                return proc
+        except (OSError, ValueError, psutil.Error):
+            pass
+        return None
+
+    def start(self):
+        """Attach to the instance running at ``port`` or start a new one.
+
+        Returns:
+            the daemon itself.
+        """
+        with self._lock:
+            if not _port_open('localhost', self.port):
+                self.profile.mkdir(parents=True, exist_ok=True)
+                self._process = _start_soffice(self.port, headless=True, profile=self.profile, detach=True)
+                try:
+                    create_time = psutil.Process(self._process.pid).create_time()
+                    self.pidfile.write_text(f'{self._process.pid} {create_time!r}')
+                except psutil.Error:
+                    pass
+            self.context = _connect_context(self.port, process=self._process, timeout=self.timeout,
+                                            counter_max=self.counter_max)
+        return self
+
+    def is_alive(self):
+        """Health check: True if the instance answers a UNO call."""
+        if self.context is None:
+            return False
+        if self.pidfile.exists() and self._verified_process() is None:
+            return False
+        try:
+            self._desktop().getComponents()
+            return True
+        except Exception:
+            return False
+
+    def restart(self):
+        """Kill the instance (if still running) and start a new one."""
+        with self._lock:
+            self._kill()
+            self.restarts += 1
+            return self.start()
+
+    def ensure(self):
+        """Restart the instance if it does not pass the health check."""
+        with self._lock:
+            if self.context is None:
+                self.start()
+            elif not self.is_alive():
+                warnings.warn(f'libreoffice at port {self.port} is not responding. Restarting.')
+                self.restart()
+        return self
+
+    def open(self, file=None):
+        """Open a document in the warm instance.
+
+        Args:
+            file (str or pathlib.Path, optional): file to open. If None, a new
+                Calc document is created.
+
+        Returns:
+            Calc object.
+        """
+        self.ensure()
+        return _open_calc(self.context, file)
+
+    def close(self, calcObject):
+        """Close a document opened with :py:meth:`open`. The instance keeps running."""
+        closeCalc(calcObject)
+
+    @contextmanager
+    def document(self, file=None):
+        """Context manager version of :py:meth:`open`/:py:meth:`close`."""
+        calcObject = self.open(file)
+        try:
+            yield calcObject
+        finally:
+            self.close(calcObject)
+
+    def watch(self, interval=5):
+        """Run health checks every ``interval`` seconds in a background thread."""
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.wait(interval):
+                try:
+                    self.ensure()
+                except Exception as e:
+                    warnings.warn(f'Cannot restart libreoffice at port {self.port}: {e!r}')
+
+        self._watcher = threading.Thread(target=loop, daemon=True)
+        self._watcher.start()
+
+    def serve(self, interval=5):
+        """Start the instance and keep it healthy until interrupted (blocking)."""
+        self.start()
+        self.watch(interval)
+        try:
+            while self._watcher.is_alive():
+                self._watcher.join(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._stop.set()
+
+    def shutdown(self, timeout=10):
+        """Stop health checks and terminate the instance."""
+        self._stop.set()
+        with self._lock:
+            self._kill(timeout, graceful=True)
+
+    def _desktop(self):
+        return self.context.ServiceManager.createInstanceWithContext('com.sun.star.frame.Desktop', self.context)
+
+    def _kill(self, timeout=0, graceful=False):
+        """Stop the instance.
+
+        Processes are only signaled if the pid is verified (see
+        :py:meth:`_verified_process`). Otherwise, or if graceful, libreoffice
+        is asked to quit through the UNO Desktop.
+        """
+        proc = self._verified_process()
+        if (graceful or proc is None) and self.context is not None:
+            try:
+                self._desktop().terminate()
+            except Exception:
+                pass
+        if proc is not None:
+            try:
+                procs = [proc] + proc.children(recursive=True)
+            except psutil.Error:
+                procs = [proc]
+            _stop_processes(procs, timeout=timeout, wait=timeout > 0)
+        if self._process is not None:
+            self._process.poll()
+            with _owned_lock:
+                _owned.pop(self._process.pid, None)
+        try:
+            self.pidfile.unlink()
+        except OSError:
+            pass
+        self._process = None
+        self.context = None
+
+
+# suffix: (filter name, export only)
+_filters = {'.ods':  ('calc8', False),
+            '.ots':  ('calc8_template', False),
+            '.xlsx': ('Calc MS Excel 2007 XML', False),
+            '.xls':  ('MS Excel 97', False),
+            '.csv':  ('Text - txt - csv (StarCalc)', True),
+            '.pdf':  ('calc_pdf_Export', True),
+            '.html': ('HTML (StarCalc)', True),
+           }
 
-    process_list = _libreoffice_processes()
-    for proc in process_list:
-        os.kill(proc['pid'], signal.SIGKILL)
 
+def _property_values(**kwargs):
+    """Return a tuple of PropertyValue structs."""
+    return tuple(uno.createUnoStruct('com.sun.star.beans.PropertyValue', name, 0, value, 0)
+                 for name, value in kwargs.items())
 
-def saveCalc(calcObject, filepath=None):
+
+def saveCalc(calcObject, filepath=None, filter=None, filter_options=None):
     """Save xlsx file.
 
+    The file format is chosen from the suffix of ``filepath`` ('.ods',
+    '.xlsx', '.xls', '.csv', '.pdf', '.html', ...).
+
     Note:
         If `filepath` have no suffix, it adds '.ods' at the end of filepath.
 
+        csv only holds one sheet, so for documents with more than one sheet,
+        each sheet is saved in its own file: ``<filepath stem>-<sheet name>.csv``.
+
     Args:
         calcObject (Calc object): Object created by :py:func:`calcmanip.connect2Calc`.
         filepath (string or pathlib.Path, optional): filepath to save file.
+        filter (str, optional): libreoffice filter name. If None, it is chosen
+            from the suffix.
+        filter_options (str, optional): filter options (e.g., for csv,
+            '44,34,76' is comma separated, double quoted, UTF-8).
+
+    Returns:
+        list of saved files.
     """
     if filepath is None:
         if calcObject.Location == '':
@@ -160,40 +1090,156 @@ def saveCalc(calcObject, filepath=None):
     if filepath.suffix == '':
         filepath = filepath.parent / (str(filepath.name) + '.ods')
 
+    # filter
+    export = False
+    if filter is None:
+        if filepath.suffix.lower() not in _filters:
+            raise ValueError(f'Cannot find a filter for {filepath.suffix} files. Use filter argument.')
+        filter, export = _filters[filepath.suffix.lower()]
+    elif filepath.suffix.lower() in _filters:
+        export = _filters[filepath.suffix.lower()][1]
+
+    # write buffered cells
+    for cachedSheet in list(_cached_sheets):
+        if cachedSheet.calcObject is None or cachedSheet.calcObject is calcObject:
+            cachedSheet.flush()
+
+    options = dict(FilterName=filter, Overwrite=True)
+    if filter_options is not None:
+        options['FilterOptions'] = filter_options
+
+    # csv (one file per sheet)
+    if filepath.suffix.lower() == '.csv':
+        names = get_sheets_name(calcObject)
+        if len(names) > 1:
+            controller = calcObject.getCurrentController()
+            saved = []
+            for name in names:
+                controller.setActiveSheet(_raw(calcObject.get_sheet_by_name(name)))
+                sheetpath = filepath.parent / f'{filepath.stem}-{name}{filepath.suffix}'
+                calcObject.storeToURL(convert_path_to_url(str(sheetpath)), _property_values(**options))
+                saved.append(sheetpath)
+                _invalidate_cache(sheetpath)
+            return saved
+
     # save
     url = convert_path_to_url(str(filepath))
-    calcObject.store_as_url(url, 'FilterName')
+    if export:
+        calcObject.storeToURL(url, _property_values(**options))
+    else:
+        calcObject.storeAsURL(url, _property_values(**options))
+    _invalidate_cache(filepath)
+    return [filepath]
+
+
+def convert(files, format='xlsx', folder=None, n=2, port=8100, filter=None, filter_options=None, **kwargs):
+    """Convert files to another format using a pool of libreoffice instances.
+
+    Files are spread across ``n`` headless instances (see :py:class:`CalcPool`).
+    A file that fails does not stop the batch.
+
+    Args:
+        files (list): files to convert.
+        format (str, optional): target format ('ods', 'xlsx', 'csv', 'pdf', ...).
+        folder (str or pathlib.Path, optional): output folder. If None, each
+            file is saved next to the original.
+        n (int, optional): number of libreoffice instances.
+        port (int, optional): port of the first instance.
+        filter, filter_options (str, optional): see :py:func:`saveCalc`.
+        **kwargs: other arguments for :py:class:`CalcPool`.
 
+    Returns:
+        list of dicts (one per file) with keys 'file', 'result' (list of saved
+        files), 'error' (None if conversion succeeded), and 'time' (seconds).
+    """
+    suffix = '.' + format.lstrip('.')
+    if folder is not None:
+        Path(folder).mkdir(parents=True, exist_ok=True)
+
+    def job(calcObject, file):
+        file = Path(file)
+        parent = file.parent if folder is None else Path(folder)
+        return saveCalc(calcObject, parent / (file.stem + suffix), filter=filter, filter_options=filter_options)
+
+    with CalcPool(n, port=port, **kwargs) as pool:
+        return pool.map(job, [Path(file).resolve() for file in files], report=True)
 
 
 # calcObject manipulation
 def get_sheets_name(calcObject):
     """Get sheets names in a tuple."""
+    if isinstance(calcObject, CalcFile):
+        return calcObject.sheet_names
     return calcObject.Sheets.ElementNames
 
 
+@contextmanager
+def batch(calcObject):
+    """Context manager that suspends recalculation and screen updates.
+
+    Inside the block, automatic calculation is turned off, controllers are
+    locked, and an action lock is added. On exit (also if an exception is
+    raised), everything is restored and, if automatic calculation was on,
+    the document is recalculated once. It can be nested: only the outermost
+    block recalculates.
+
+    Args:
+        calcObject (Calc object): Object created by :py:func:`connect2Calc`.
+
+    Example:
+        >>> with batch(calcObject):
+        ...     update_xlsx(parameters, 'Sheet1', calcObject)
+        ...     group_color('Sheet1', calcObject)
+    """
+    automatic = calcObject.isAutomaticCalculationEnabled()
+    if automatic:
+        calcObject.enableAutomaticCalculation(False)
+    calcObject.lockControllers()
+    calcObject.addActionLock()
+    try:
+        yield calcObject
+    finally:
+        try:
+            calcObject.removeActionLock()
+        finally:
+            try:
+                calcObject.unlockControllers()
+            finally:
+                if automatic:
+                    calcObject.enableAutomaticCalculation(True)
+                    calcObject.calculate()
+
+
 
 
 def set_col_width(sheetObject, col, width):
 
+    if isinstance(sheetObject, CachedSheet):
+        return sheetObject.set_col_width(col, width)
     colsObject = sheetObject.getColumns()
     colsObject[col].setPropertyValue('Width', width)
 
 
 def get_col_width(sheetObject, col):
 
+    if isinstance(sheetObject, CachedSheet):
+        return sheetObject.get_col_width(col)
     colsObject = sheetObject.getColumns()
     return colsObject[col].Width
 
 
 def set_row_height(sheetObject, row, height):
 
+    if isinstance(sheetObject, CachedSheet):
+        return sheetObject.set_row_height(row, height)
     rowsObject = sheetObject.getRows()
     rowsObject[row].setPropertyValue('Height', height)
 
 
 def get_row_height(sheetObject, row):
 
+    if isinstance(sheetObject, CachedSheet):
+        return sheetObject.get_row_height(row)
     colsObject = sheetObject.getRows()
     return colsObject[row].Height
 
@@ -204,6 +1250,8 @@ def get_cell_value(sheetObject, row, col, type='formula'):
     """
     type='data', 'formula'
     """
+    if isinstance(sheetObject, (CachedSheet, FileSheet)):
+        return sheetObject.get_cell_value(row, col, type=type)
     if type == 'formula':
         return sheetObject.get_cell_by_position(col, row).getFormula()
     elif type == 'data':
@@ -217,6 +1265,8 @@ def set_cell_value(sheetObject, row, col, value, type='formula'):
     """
     type='data', 'formula'
     """
+    if isinstance(sheetObject, CachedSheet):
+        return sheetObject.set_cell_value(row, col, value, type=type)
     if type == 'formula':
         sheetObject.get_cell_by_position(col, row).setFormula(value)
     elif type == 'data':
@@ -224,6 +1274,43 @@ def set_cell_value(sheetObject, row, col, value, type='formula'):
     else:
         warnings.warn(f"type = {type} is not a valid option. Using type = 'data'.")
         sheetObject.get_cell_by_position(col, row).setString(value)
+    _drop_snapshot(sheetObject)
+
+
+_font_property_list_parsed = [['FormatID', 'CharWeight', 'CharHeight', 'CharColor', 'CellBackColor'],
+                              [ 'CharFontName',  'CharFont', 'CellStyle'],
+                              ['CharUnderline', 'CharCrossedOut', 'CharEmphasis', 'CharEscapement', 'CharContoured'],
+                              ['CharPosture',  'CharPostureComplex',  'CharRelief',  'CharShadowed',  'CharStrikeout',   'CharUnderlineColor',  'CharUnderlineHasColor',]
+                             ]
+_border_property_list = ['TableBorder', 'TableBorder2']#, 'LeftBorder', 'LeftBorder2', 'RightBorder', 'RightBorder2', 'TopBorder', 'TopBorder2', 'BottomBorder', 'BottomBorder2']
+
+
+def _format_property_names(Font=1, ConditionalFormat=False, Border=False, additional=None):
+    """Return the sorted tuple of cell properties copied by copy_cell/copy_format."""
+    Font = int(Font)
+    if Font > 4:
+        Font = 4
+    elif Font <0:
+        Font = 0
+
+    names = [item for sublist in _font_property_list_parsed[0:Font] for item in sublist]
+    if ConditionalFormat:
+        names.append('ConditionalFormat')
+    if Border:
+        names += _border_property_list
+    if additional is not None:
+        names += list(additional)
+    # XMultiPropertySet expects unique names in alphabetical order
+    return tuple(sorted(set(names)))
+
+
+def _set_properties(obj, names, values):
+    """Set several properties with one call (one by one if it fails)."""
+    try:
+        obj.setPropertyValues(names, values)
+    except Exception:
+        for name, value in zip(names, values):
+            obj.setPropertyValue(name, value)
 
 
 def copy_cell(sheet2copyFrom, sheet2pasteAt, row, col, type='formula',
@@ -239,13 +1326,10 @@ def copy_cell(sheet2copyFrom, sheet2pasteAt, row, col, type='formula',
     need to include additional properties, have a look at
     ``sheetObject.get_cell_by_position(0, 0)._show_attributes()`` and find the
     desired propertie. Then, include it in ``additional``.
-    """
-    Font = int(Font)
-    if Font > 4:
-        Font = 4
-    elif Font <0:
-        Font = 0
 
+    All properties are read and written with a single call each. To copy the
+    format of many cells, use :py:func:`copy_format`.
+    """
     if row2pasteAt is None:
         row2pasteAt = row
     if col2pasteAt is None:
@@ -255,33 +1339,11 @@ def copy_cell(sheet2copyFrom, sheet2pasteAt, row, col, type='formula',
     if type is not None:
         set_cell_value(sheet2pasteAt, row=row2pasteAt, col=col2pasteAt, value=get_cell_value(sheet2copyFrom, row, col, type=type), type=type)
 
-    # font name
-    font_property_list_parsed = [['FormatID', 'CharWeight', 'CharHeight', 'CharColor', 'CellBackColor'],
-                                 [ 'CharFontName',  'CharFont', 'CellStyle'],
-                                 ['CharUnderline', 'CharCrossedOut', 'CharEmphasis', 'CharEscapement', 'CharContoured'],
-                                 ['CharPosture',  'CharPostureComplex',  'CharRelief',  'CharShadowed',  'CharStrikeout',   'CharUnderlineColor',  'CharUnderlineHasColor',]
-                                ]
-
-    font_property_list = [item for sublist in font_property_list_parsed[0:Font] for item in sublist]
-    for property in font_property_list:
-        sheet2pasteAt.get_cell_by_position(col2pasteAt, row2pasteAt).setPropertyValue(property, getattr(sheet2copyFrom.get_cell_by_position(col, row), property))
-
-    # conditional formating
-    if ConditionalFormat:
-        font_property_list = ['ConditionalFormat']
-        for property in font_property_list:
-            sheet2pasteAt.get_cell_by_position(col2pasteAt, row2pasteAt).setPropertyValue(property, getattr(sheet2copyFrom.get_cell_by_position(col, row), property))
-
-    # border
-    if Border:
-        border_property_list = ['TableBorder', 'TableBorder2']#, 'LeftBorder', 'LeftBorder2', 'RightBorder', 'RightBorder2', 'TopBorder', 'TopBorder2', 'BottomBorder', 'BottomBorder2']
-        for property in border_property_list:
-            sheet2pasteAt.get_cell_by_position(col2pasteAt, row2pasteAt).setPropertyValue(property, getattr(sheet2copyFrom.get_cell_by_position(col, row), property))
-
-    # additional
-    if additional is not None:
-        for property in additional:
-            sheet2pasteAt.get_cell_by_position(col2pasteAt, row2pasteAt).setPropertyValue(property, getattr(sheet2copyFrom.get_cell_by_position(col, row), property))
+    # font, conditional formating, border, and additional
+    names = _format_property_names(Font, ConditionalFormat, Border, additional)
+    if len(names) > 0:
+        values = sheet2copyFrom.get_cell_by_position(col, row).getPropertyValues(names)
+        _set_properties(sheet2pasteAt.get_cell_by_position(col2pasteAt, row2pasteAt), names, values)
 
     # col and row width
     if resize is not None:
@@ -296,12 +1358,98 @@ def copy_cell(sheet2copyFrom, sheet2pasteAt, row, col, type='formula',
             warnings.warn(f"resize = {resize} is not a valid option. Using resize = None.")
 
 
+def _style_rectangles(keys):
+    """Merge cells with the same style into rectangles.
+
+    Args:
+        keys (list): list of rows, each row is a list with the style key of
+            each cell.
+
+    Returns:
+        dict {key: list of [row_init, col_init, row_final, col_final]} with
+        relative (inclusive) positions.
+    """
+    rectangles = dict()
+    open_runs = dict()
+    for r, row in enumerate(keys):
+        runs = dict()
+        c0 = 0
+        for c in range(1, len(row)+1):
+            if c == len(row) or row[c] != row[c0]:
+                run = (c0, c-1, row[c0])
+                rectangle = open_runs.get(run)
+                if rectangle is None:
+                    rectangle = [r, c0, r, c-1]
+                    rectangles.setdefault(row[c0], []).append(rectangle)
+                else:
+                    rectangle[2] = r
+                runs[run] = rectangle
+                c0 = c
+        open_runs = runs
+    return rectangles
+
+
+def copy_format(sheet2copyFrom, sheet2pasteAt, row_init, col_init, row_final, col_final,
+                Font=1, ConditionalFormat=False, Border=False, additional=None,
+                row2pasteAt=None, col2pasteAt=None):
+    """Copy the format of a range of cells (final row and col not included).
+
+    The properties of each source cell are read with one call. Target cells
+    that share the same format are merged into rectangles and each rectangle
+    is formatted with a single call.
+
+    Args:
+        sheet2copyFrom, sheet2pasteAt (sheet object): source and target sheets.
+        row_init, col_init, row_final, col_final (int): source range.
+        Font, ConditionalFormat, Border, additional: properties to copy (see
+            :py:func:`copy_cell`).
+        row2pasteAt, col2pasteAt (int, optional): top left target cell. If
+            None, same as source.
+
+    Returns:
+        number of calls used to apply the format.
+    """
+    if row2pasteAt is None:
+        row2pasteAt = row_init
+    if col2pasteAt is None:
+        col2pasteAt = col_init
+
+    names = _format_property_names(Font, ConditionalFormat, Border, additional)
+    if len(names) == 0:
+        return 0
+
+    styles = dict()
+    keys = []
+    for row in range(row_init, row_final):
+        row_keys = []
+        for col in range(col_init, col_final):
+            values = sheet2copyFrom.get_cell_by_position(col, row).getPropertyValues(names)
+            key = tuple(repr(value) for value in values)
+            styles.setdefault(key, values)
+            row_keys.append(key)
+        keys.append(row_keys)
+
+    n_calls = 0
+    for key, rectangles in _style_rectangles(keys).items():
+        for r0, c0, r1, c1 in rectangles:
+            cellRange = sheet2pasteAt.get_cell_range_by_position(col2pasteAt+c0, row2pasteAt+r0, col2pasteAt+c1, row2pasteAt+r1)
+            _set_properties(cellRange, names, styles[key])
+            n_calls += 1
+    return n_calls
+
 
 def get_cells_value(sheetObject, row_init, col_init, row_final, col_final, type='data'):
     """
     type= formula or data.
+
+    Rows and columns from init to final (inclusive).
     """
-    sheet_data = sheetObject.get_cell_range_by_position(row_init, col_init, row_final, col_final)
+    if isinstance(sheetObject, CachedSheet):
+        sheetObject.flush()
+        sheetObject = sheetObject.sheetObject
+    if isinstance(sheetObject, FileSheet):
+        return sheetObject.get_cells_value(row_init, col_init, row_final, col_final, type=type)
+    sheet_data = sheetObject.get_cell_range_by_position(col_init, row_init, col_final, row_final)
     if type == 'formula':
         return sheet_data.getFormulaArray()
     elif type == 'data':
@@ -311,30 +1459,249 @@ def get_cells_value(sheetObject, row_init, col_init, row_final, col_final, type=
         return sheet_data.getDataArray()
 
 
-def set_cells_value(sheetObject, row_init, col_init, data, type='formula'):
-    """
-    type=formula or data.
+def _numeric_column(values, type='data'):
+    """Convert a column (tuple of cell values) to a float array.
 
-    another option would be value: sheet444.set_columns_value(x, y, data)
+    Empty cells become NaN. Returns None if the column is not numeric.
     """
+    if type == 'data':
+        if not all(v.__class__ is float or v == '' for v in values):
+            return None
+        return np.array([np.nan if v == '' else v for v in values], dtype=float)
+    try:
+        return np.array([np.nan if v == '' else float(v) for v in values], dtype=float)
+    except (ValueError, TypeError):
+        return None
 
-    if type == 'formula':
-        for row, row_data in enumerate(data):
-            sheetObject.set_columns_formula(row_init, row+col_init, row_data)
-    elif type == 'data':
-        for row, row_data in enumerate(data):
-            sheetObject.set_columns_str(row_init, row+col_init, row_data)
+
+def read_range_array(sheetObject, row_init, col_init, row_final, col_final, type='data',
+                     columns=False, header=False, mask=False, chunk_rows=10000):
+    """Read a range of cells into numpy arrays.
+
+    The dtype is inferred per column: float64 for columns with only numbers
+    (empty cells become NaN) and object for the others (empty cells become
+    None). Large ranges are read in blocks of ``chunk_rows`` rows, so only one
+    block of cell values is held in memory at a time.
+
+    Args:
+        sheetObject (sheet object): sheet.
+        row_init, col_init, row_final, col_final (int): first and last row and
+            column of the range (inclusive).
+        type (str, optional): 'data' or 'formula'. For 'formula', columns
+            where all the text can be converted to numbers are numeric.
+        columns (bool, optional): if True, returns a dict of column arrays
+            with the column number as key.
+        header (bool, optional): if True, the first row of the range is used
+            as keys of the dict (implies ``columns=True``).
+        mask (bool, optional): if True, returns masked arrays where empty cells
+            are masked.
+        chunk_rows (int, optional): number of rows read per call.
+
+    Returns:
+        2D array (float64 if all columns are numeric, object otherwise) or
+        dict of 1D arrays.
+    """
+    if type != 'data' and type != 'formula':
+        warnings.warn(f"type = {type} is not a valid option. Using type = 'data'.")
+        type = 'data'
+
+    keys = list(range(col_init, col_final+1))
+    if header:
+        columns = True
+        keys = list(get_cells_value(sheetObject, row_init, col_init, row_init, col_final, type='data')[0])
+        row_init += 1
+
+    n_rows = max(row_final - row_init + 1, 0)
+    n_cols = len(keys)
+    data = [np.empty(n_rows, dtype=float) for _ in range(n_cols)]
+    empty = np.zeros((n_rows, n_cols), dtype=bool)
+
+    for start in range(row_init, row_final+1, chunk_rows):
+        stop = min(start + chunk_rows, row_final + 1)
+        block = get_cells_value(sheetObject, start, col_init, stop - 1, col_final, type=type)
+        i, j_stop = start - row_init, stop - row_init
+        for j, values in enumerate(zip(*block)):
+            empty[i:j_stop, j] = [v == '' for v in values]
+            if data[j].dtype == float:
+                numeric = _numeric_column(values, type)
+                if numeric is not None:
+                    data[j][i:j_stop] = numeric
+                    continue
+                data[j] = data[j].astype(object)
+                data[j][:i][empty[:i, j]] = None
+            data[j][i:j_stop] = [None if v == '' else v for v in values]
+        del block
+
+    if columns:
+        if mask:
+            data = [np.ma.masked_array(data[j], mask=empty[:, j]) for j in range(n_cols)]
+        return dict(zip(keys, data))
+
+    if all(d.dtype == float for d in data):
+        array = np.empty((n_rows, n_cols), dtype=float)
     else:
+        array = np.empty((n_rows, n_cols), dtype=object)
+    for j in range(n_cols):
+        array[:, j] = data[j]
+        data[j] = None
+    if mask:
+        return np.ma.masked_array(array, mask=empty)
+    return array
+
+
+def _uno_value(value, type='formula'):
+    """Convert a python/numpy value to what setDataArray/setFormulaArray expects.
+
+    None and NaN become empty cells. Infinities become the text 'inf'/'-inf'.
+    """
+    if value is None:
+        return ''
+    if isinstance(value, (int, float, np.number)) and not isinstance(value, (bool, np.bool_)):
+        value = float(value) if isinstance(value, (float, np.floating)) else int(value)
+        if value != value:
+            return ''
+        if value in (np.inf, -np.inf):
+            return 'inf' if value > 0 else '-inf'
+        if type == 'formula':
+            if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+                return str(int(value))
+            return repr(value)
+        return float(value)
+    if isinstance(value, (bool, np.bool_)):
+        if type == 'formula':
+            return 'TRUE' if value else 'FALSE'
+        return float(value)
+    return str(value)
+
+
+def _uno_rows(data, type='formula'):
+    """Convert rows of values to a tuple of tuples of equal length."""
+    if isinstance(data, np.ndarray) and data.dtype.kind in 'iuf':
+        if type == 'data' and np.isfinite(data).all():
+            return tuple(map(tuple, data.astype(float).tolist()))
+        data = data.tolist()
+    rows = [[_uno_value(v, type) for v in row] for row in data]
+    n_cols = max((len(row) for row in rows), default=0)
+    return tuple(tuple(row) + ('', )*(n_cols - len(row)) for row in rows)
+
+
+def set_cells_value(sheetObject, row_init, col_init, data, type='formula', chunk_rows=10000):
+    """Write a block of values starting at (row_init, col_init).
+
+    The block is sent with a single setFormulaArray (type='formula') or
+    setDataArray (type='data') call per chunk of rows. With type='data',
+    numbers are stored as numbers, not as text.
+
+    Args:
+        sheetObject (sheet object): sheet.
+        row_init, col_init (int): top left cell.
+        data (list or array): list of rows (list of lists) or 2D array. A 1D
+            array is written as a single row. None and NaN are written as empty
+            cells.
+        type (str, optional): 'formula' or 'data'.
+        chunk_rows (int, optional): max number of rows written per call.
+    """
+    if type != 'formula' and type != 'data':
         warnings.warn(f"type = {type} is not a valid option. Using type = 'data'.")
-        for row, row_data in enumerate(data):
-            sheetObject.set_columns_str(row_init, row+col_init, row_data)
+        type = 'data'
+
+    if isinstance(sheetObject, CachedSheet):
+        sheetObject.flush()
+        n_rows = len(data) if getattr(data, 'ndim', 2) > 1 else 1
+        sheetObject.invalidate(row_init, col_init, row_init+n_rows-1, None)
+        sheetObject = sheetObject.sheetObject
+    _drop_snapshot(sheetObject)
+
+    if isinstance(data, np.ndarray) and data.ndim < 2:
+        data = data.reshape(1, -1)
+    elif not isinstance(data, np.ndarray):
+        data = [row for row in data]
+        if data and not isinstance(data[0], (list, tuple, np.ndarray)):
+            data = [data]
+
+    for start in range(0, len(data), chunk_rows):
+        rows = _uno_rows(data[start:start+chunk_rows], type=type)
+        n_cols = len(rows[0])
+        if n_cols == 0:
+            continue
+        cellRange = sheetObject.get_cell_range_by_position(col_init, row_init+start,
+                                                           col_init+n_cols-1, row_init+start+len(rows)-1)
+        if type == 'formula':
+            cellRange.setFormulaArray(rows)
+        else:
+            cellRange.setDataArray(rows)
+
+
+def _raw(obj):
+    """Return the UNO object wrapped by an unotools object."""
+    return getattr(obj, 'raw', obj)
+
+
+def _in_document(calcObject, sheetObject):
+    """Return True if sheetObject is a sheet of calcObject.
+
+    The UNO objects are compared, since two documents may have sheets with
+    the same name at the same position.
+    """
+    try:
+        return calcObject.Sheets.getByName(sheetObject.getName()) == _raw(sheetObject)
+    except Exception:
+        return False
+
+
+def _native_copy(sheet2copyFrom, sheet2pasteAt, row_init, col_init, row_final, col_final,
+                 row2pasteAt, col2pasteAt, calc2copyFrom, calc2pasteAt=None):
+    """Copy a range (final row and col not included) inside libreoffice.
+
+    If both sheets are in the same document, the range is copied with
+    copyRange. Otherwise, it goes through a single transferable (clipboard
+    like) transfer between the documents controllers.
+
+    Returns:
+        True if the copy was done, False otherwise.
+    """
+    source = sheet2copyFrom.get_cell_range_by_position(col_init, row_init, col_final-1, row_final-1)
+    try:
+        if calc2pasteAt is None or calc2pasteAt is calc2copyFrom:
+            if not (_in_document(calc2copyFrom, sheet2copyFrom) and _in_document(calc2copyFrom, sheet2pasteAt)):
+                return False
+            destination = sheet2pasteAt.get_cell_by_position(col2pasteAt, row2pasteAt).getCellAddress()
+            sheet2pasteAt.copyRange(destination, source.getRangeAddress())
+            _drop_snapshot(sheet2pasteAt)
+        else:
+            if not (_in_document(calc2copyFrom, sheet2copyFrom) and _in_document(calc2pasteAt, sheet2pasteAt)):
+                return False
+            source_controller = calc2copyFrom.getCurrentController()
+            source_controller.select(_raw(source))
+            transferable = source_controller.getTransferable()
+            target_controller = calc2pasteAt.getCurrentController()
+            target_controller.setActiveSheet(_raw(sheet2pasteAt))
+            target_controller.select(_raw(sheet2pasteAt.get_cell_by_position(col2pasteAt, row2pasteAt)))
+            target_controller.insertTransferable(transferable)
+            _drop_snapshot(sheet2pasteAt)
+    except Exception as e:
+        warnings.warn(f'Native copy failed ({e!r}). Copying through python.')
+        return False
+    return True
 
 
 def copy_cells(sheet2copyFrom, sheet2pasteAt, row_init, col_init, row_final, col_final, type='formula',
               Font=0, ConditionalFormat=False, Border=False, resize=None,
-              row2pasteAt=None, col2pasteAt=None, additional=None):
+              row2pasteAt=None, col2pasteAt=None, additional=None,
+              calc2copyFrom=None, calc2pasteAt=None):
     """
         type='data', 'formula', 'none'
+
+    Final row and col are not included. Values are copied with one bulk read
+    and write, and the format with :py:func:`copy_format`.
+
+    If ``calc2copyFrom`` (the Calc object of sheet2copyFrom) is given and
+    type='formula', the copy is done by libreoffice itself (values, formulas
+    and ALL the cell formatting, ignoring Font, ConditionalFormat, Border, and
+    additional): with copyRange if sheet2pasteAt is in the same document, or
+    with a single transferable if ``calc2pasteAt`` (the Calc object of
+    sheet2pasteAt) is a different document. The copy through python is used
+    as fallback.
     """
 
     if row2pasteAt is None:
@@ -342,15 +1709,21 @@ def copy_cells(sheet2copyFrom, sheet2pasteAt, row_init, col_init, row_final, col
     if col2pasteAt is None:
         col2pasteAt = col_init
 
-    if Font>0 or ConditionalFormat is not False or Border is not False or additional is not False:
-        for row_relative, row in enumerate(range(row_init, row_final)):
-            for col_relative, col in enumerate(range(col_init, col_final)):
-                copy_cell(sheet2copyFrom, sheet2pasteAt, row, col, type=type,
-                          Font=Font, ConditionalFormat=ConditionalFormat, Border=Border, resize=None,
-                          row2pasteAt=row2pasteAt+row_relative, col2pasteAt=col2pasteAt+col_relative, additional=additional)
-    else:
-        data = get_cells_value(sheet2copyFrom, row_init, col_init, row_final, col_final, type=type)
-        set_cells_value(row2pasteAt, row2pasteAt, col2pasteAt, data, type=type)
+    native = False
+    if calc2copyFrom is not None and type == 'formula' and row_final > row_init and col_final > col_init:
+        native = _native_copy(sheet2copyFrom, sheet2pasteAt, row_init, col_init, row_final, col_final,
+                              row2pasteAt, col2pasteAt, calc2copyFrom, calc2pasteAt)
+
+    # values
+    if not native and type is not None and type != 'none' and row_final > row_init and col_final > col_init:
+        data = get_cells_value(sheet2copyFrom, row_init, col_init, row_final-1, col_final-1, type=type)
+        set_cells_value(sheet2pasteAt, row2pasteAt, col2pasteAt, data, type=type)
+
+    # format
+    if not native and (Font>0 or ConditionalFormat is not False or Border is not False or additional is not None):
+        copy_format(sheet2copyFrom, sheet2pasteAt, row_init, col_init, row_final, col_final,
+                    Font=Font, ConditionalFormat=ConditionalFormat, Border=Border, additional=additional,
+                    row2pasteAt=row2pasteAt, col2pasteAt=col2pasteAt)
 
     # col and row width
     if resize is not None:
@@ -366,17 +1739,47 @@ def copy_cells(sheet2copyFrom, sheet2pasteAt, row_init, col_init, row_final, col
 
 
 def copy_sheet(sheet2copy, sheet2paste, type='formula',
-              Font=0, ConditionalFormat=False, Border=False, resize=None, additional=None):
-    """"
-    """"
-    last_col = len(sheet2copy.getColumnDescriptions())
-    last_row = len(sheet2copy.getRowDescriptions())
+              Font=0, ConditionalFormat=False, Border=False, resize=None, additional=None,
+              calc2copyFrom=None, calc2pasteAt=None, position=None):
+    """Copy a sheet.
+
+    If ``sheet2paste`` is a string and ``calc2copyFrom`` (the Calc object of
+    sheet2copy) is given, libreoffice copies the whole sheet (with formatting
+    and column/row sizes) to a new sheet with this name, at ``position``
+    (default: after the last sheet). The new sheet is created in
+    ``calc2pasteAt`` if given, otherwise in calc2copyFrom.
+
+    Otherwise, it works like :py:func:`copy_cells` (including the native copy
+    when ``calc2copyFrom``/``calc2pasteAt`` are given).
+
+    Returns:
+        sheet object where the data was pasted.
+    """
+    if isinstance(sheet2paste, str):
+        if calc2copyFrom is None:
+            raise ValueError('calc2copyFrom is required to copy to a new sheet.')
+        if not _in_document(calc2copyFrom, sheet2copy):
+            raise ValueError('sheet2copy is not a sheet of calc2copyFrom.')
+        target = calc2copyFrom if calc2pasteAt is None else calc2pasteAt
+        if position is None:
+            position = target.Sheets.getCount()
+        if target is calc2copyFrom or _raw(target) == _raw(calc2copyFrom):
+            calc2copyFrom.Sheets.copyByName(sheet2copy.getName(), sheet2paste, position)
+        else:
+            index = target.Sheets.importSheet(_raw(calc2copyFrom), sheet2copy.getName(), position)
+            target.Sheets.getByIndex(index).setName(sheet2paste)
+        return target.get_sheet_by_name(sheet2paste)
+
+    last_row, last_col = get_used_area(sheet2copy)
 
-    copy_cells(sheet2copy, sheet2paste, 0, 0, last_row, last_col, type=type, Font=Font, ConditionalFormat=ConditionalFormat, Border=Border, resize=resize, additional=None)
+    copy_cells(sheet2copy, sheet2paste, 0, 0, last_row+1, last_col+1, type=type, Font=Font, ConditionalFormat=ConditionalFormat, Border=Border, resize=resize, additional=additional,
+               calc2copyFrom=calc2copyFrom, calc2pasteAt=calc2pasteAt)
+    return sheet2paste
 
 
 def get_cell_value_from_sheets(sheetObject_list, row, col, type='data'):
     """
+    For many cells, use :py:func:`get_cells_value_from_sheets`.
     """
     values = []
     for sheetObject in sheetObject_list:
@@ -384,71 +1787,1148 @@ def get_cell_value_from_sheets(sheetObject_list, row, col, type='data'):
     return values
 
 
+class SheetStack(object):
+    """Same range of cells from several sheets, stacked in a 3D array.
+
+    Reductions across sheets (:py:meth:`mean`, :py:meth:`min`, ...) ignore
+    empty cells (NaN).
+
+    Args:
+        array (np.array): array with shape (sheet, row, col).
+        labels (list): label of each sheet (sheet name or file).
+    """
+
+    def __init__(self, array, labels):
+        self.array = array
+        self.labels = list(labels)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, label):
+        """2D array of a sheet."""
+        return self.array[self.labels.index(label)]
+
+    def _reduce(self, function):
+        if self.array.dtype != float:
+            raise TypeError('Reductions need numeric cells only (some cells have text).')
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # all-NaN cells
+            return function(self.array, axis=0)
+
+    def mean(self):
+        """Mean of each cell across sheets."""
+        return self._reduce(np.nanmean)
+
+    def median(self):
+        """Median of each cell across sheets."""
+        return self._reduce(np.nanmedian)
+
+    def std(self):
+        """Standard deviation of each cell across sheets."""
+        return self._reduce(np.nanstd)
+
+    def min(self):
+        """Min of each cell across sheets."""
+        return self._reduce(np.nanmin)
+
+    def max(self):
+        """Max of each cell across sheets."""
+        return self._reduce(np.nanmax)
+
+    def sum(self):
+        """Sum of each cell across sheets."""
+        return self._reduce(np.nansum)
+
+
+def _stack(blocks, labels):
+    """Return a SheetStack from 2D arrays."""
+    dtype = float if all(block.dtype == float for block in blocks) else object
+    shape = blocks[0].shape if blocks else (0, 0)
+    array = np.empty((len(blocks), ) + shape, dtype=dtype)
+    for i, block in enumerate(blocks):
+        array[i] = block
+    return SheetStack(array, labels)
+
+
+def get_cells_value_from_sheets(sheets, row_init, col_init, row_final, col_final, calcObject=None,
+                                type='data', workers=1):
+    """Read the same range of cells from several sheets into a 3D array.
+
+    Each sheet is read with a single call (see :py:func:`read_range_array`).
+
+    Args:
+        sheets (str or list): list of sheet objects, list of sheet names, or a
+            sheet name pattern (e.g., 'run_*').
+        row_init, col_init, row_final, col_final (int): first and last row and
+            column of the range (inclusive).
+        calcObject (Calc object, optional): Object created by connect2calc().
+            Required if sheets are names or a pattern.
+        type (str, optional): 'data' or 'formula'.
+        workers (int, optional): number of sheets read at the same time. Use
+            it for sheets of documents in different libreoffice instances
+            (for files, see :py:meth:`CalcPool.stack`).
+
+    Returns:
+        :py:class:`SheetStack` with shape (sheet, row, col). Empty cells are
+        NaN (or None, if some cells have text).
+
+    Example:
+        >>> stack = get_cells_value_from_sheets('run_*', 1, 0, 100, 5, calcObject)
+        >>> stack.labels
+        ['run_1', 'run_2', 'run_3']
+        >>> average = stack.mean()
+    """
+    if isinstance(sheets, str):
+        sheets = fnmatch.filter(get_sheets_name(calcObject), sheets)
+    labels = []
+    sheetObjects = []
+    for sheet in sheets:
+        if isinstance(sheet, str):
+            labels.append(sheet)
+            sheetObjects.append(calcObject.get_sheet_by_name(sheet))
+        else:
+            labels.append(sheet.getName())
+            sheetObjects.append(sheet)
+
+    def read(sheetObject):
+        return read_range_array(sheetObject, row_init, col_init, row_final, col_final, type=type,
+                                chunk_rows=max(row_final - row_init + 1, 1))
+
+    if workers > 1 and len(sheetObjects) > 1:
+        with futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            blocks = list(executor.map(read, sheetObjects))
+    else:
+        blocks = [read(sheetObject) for sheetObject in sheetObjects]
+    return _stack(blocks, labels)
+
+
+# content cells: VALUE + DATETIME + STRING + FORMULA (com.sun.star.sheet.CellFlags)
+_content_flags = 1 + 2 + 4 + 16
+
+
+def get_used_area(sheetObject):
+    """Return the last row and column of the used area of a sheet.
+
+    It takes two calls, regardless of the size of the sheet.
+
+    Returns:
+        (last_row, last_col)
+    """
+    if isinstance(sheetObject, FileSheet):
+        return sheetObject.get_used_area()
+    cursor = sheetObject.createCursor()
+    cursor.gotoEndOfUsedArea(False)
+    address = cursor.getRangeAddress()
+    return address.EndRow, address.EndColumn
+
+
+def _last_content(sheetObject, col_init, row_init, col_final, row_final, end='EndRow'):
+    """Last row (or column, end='EndColumn') with content in a range, -1 if empty."""
+    if isinstance(sheetObject, FileSheet):
+        return sheetObject.last_content(col_init, row_init, col_final, row_final, end=end)
+    cellRange = sheetObject.get_cell_range_by_position(col_init, row_init, col_final, row_final)
+    addresses = cellRange.queryContentCells(_content_flags).getRangeAddresses()
+    return max((getattr(address, end) for address in addresses), default=-1)
+
+
+def get_last_row(sheetObject, col=None):
+    """Return the last row with content of a sheet or column (-1 if empty).
+
+    Args:
+        sheetObject (sheet object): sheet.
+        col (int, optional): column. If None, the whole sheet is considered.
+    """
+    last_row, last_col = get_used_area(sheetObject)
+    if col is None:
+        col_init = 0
+        col = last_col
+    else:
+        col_init = col
+    return _last_content(sheetObject, col_init, 0, col, last_row, end='EndRow')
+
+
+def get_last_col(sheetObject, row=None):
+    """Return the last column with content of a sheet or row (-1 if empty).
+
+    Args:
+        sheetObject (sheet object): sheet.
+        row (int, optional): row. If None, the whole sheet is considered.
+    """
+    last_row, last_col = get_used_area(sheetObject)
+    if row is None:
+        row_init = 0
+        row = last_row
+    else:
+        row_init = row
+    return _last_content(sheetObject, 0, row_init, last_col, row, end='EndColumn')
+
+
+def get_column_values(sheetObject, col, row_init=0, type='data'):
+    """Return the values of a column from row_init until the first empty cell.
+
+    The column is read with a single call (plus two calls to find the used
+    area).
+    """
+    last_row, last_col = get_used_area(sheetObject)
+    if last_row < row_init or last_col < col:
+        return []
+    values = []
+    for row in get_cells_value(sheetObject, row_init, col, last_row, col, type=type):
+        if row[0] == '':
+            break
+        values.append(row[0])
+    return values
+
+
+def iter_rows(sheetObject, chunk_rows=1000, type='data', array=False, prefetch=False,
+              row_init=0, col_init=0, row_final=None, col_final=None):
+    """Iterate over the rows of a sheet in blocks of ``chunk_rows`` rows.
+
+    Only the used area of the sheet is read (unless row_final/col_final are
+    given), one block per call, so sheets larger than memory can be
+    processed.
+
+    Args:
+        sheetObject (sheet object): sheet.
+        chunk_rows (int, optional): number of rows per block.
+        type (str, optional): 'data' or 'formula'.
+        array (bool, optional): if True, blocks are numpy arrays (see
+            :py:func:`read_range_array`). Otherwise, tuples of rows (see
+            :py:func:`get_cells_value`).
+        prefetch (bool, optional): if True, the next block is read in a
+            background thread while the current one is processed. The next
+            block is only read once the current one is handed over, so at
+            most two blocks are in memory (the current one and the next).
+        row_init, col_init (int, optional): first row and column.
+        row_final, col_final (int, optional): last row and column (inclusive).
+            If None, the end of the used area.
+
+    Yields:
+        blocks of rows.
+
+    Example:
+        >>> for block in iter_rows(sheetObject, chunk_rows=10000, array=True):
+        ...     total += np.nansum(block[:, 3])
+    """
+    if row_final is None or col_final is None:
+        last_row, last_col = get_used_area(sheetObject)
+        if row_final is None:
+            row_final = last_row
+        if col_final is None:
+            col_final = last_col
+
+    def fetch(start):
+        stop = min(start + chunk_rows - 1, row_final)
+        if array:
+            return read_range_array(sheetObject, start, col_init, stop, col_final, type=type, chunk_rows=chunk_rows)
+        return get_cells_value(sheetObject, start, col_init, stop, col_final, type=type)
+
+    starts = range(row_init, row_final+1, chunk_rows)
+    if not prefetch:
+        for start in starts:
+            yield fetch(start)
+        return
+
+    blocks = queue.Queue()
+    wanted = threading.Semaphore(1)  # released each time a block is handed over
+    stop = threading.Event()
+
+    def producer():
+        try:
+            for start in starts:
+                while not wanted.acquire(timeout=0.1):
+                    if stop.is_set():
+                        return
+                if stop.is_set():
+                    return
+                blocks.put((fetch(start), None))
+        except Exception as e:
+            blocks.put((None, e))
+            return
+        blocks.put((None, StopIteration()))
+
+    thread = threading.Thread(target=producer, daemon=True)
+    thread.start()
+    try:
+        while True:
+            block, error = blocks.get()
+            if isinstance(error, StopIteration):
+                return
+            if error is not None:
+                raise error
+            wanted.release()
+            yield block
+    finally:
+        stop.set()
+        thread.join()
+
+
+_cached_sheets = weakref.WeakSet()
+
+
+class CachedSheet(object):
+    """Sheet wrapper that caches reads and buffers writes.
+
+    Cells are read in blocks of ``block_rows`` x ``block_cols`` cells with a
+    single call and kept in memory. When the cache is larger than
+    ``max_bytes``, the least recently used blocks are evicted. Writes are kept
+    in a buffer and sent as bulk range writes on :py:meth:`flush`, on
+    :py:func:`saveCalc`, or at the end of a ``with`` block.
+
+    The helper functions of this module (:py:func:`get_cell_value`,
+    :py:func:`set_cell_value`, :py:func:`get_col_width`,
+    :py:func:`get_cells_value`, ...) accept a CachedSheet in place of a sheet
+    object. Other attributes are forwarded to the sheet object.
+
+    Note:
+        With type='data', :py:func:`get_cell_value` returns text, as for a
+        sheet object. Numbers are converted from the cached values, so they
+        match getString() for cells in the General format, but not for cells
+        with a number format (e.g., dates or fixed decimals).
+
+        If the sheet is changed by other means, call :py:meth:`invalidate`.
+
+    Args:
+        sheetObject (sheet object): sheet.
+        calcObject (Calc object, optional): document of the sheet. If given,
+            only :py:func:`saveCalc` of this document flushes the buffer.
+        block_rows, block_cols (int, optional): size of the blocks.
+        max_bytes (int, optional): approximate memory budget of the cache.
+        max_pending (int, optional): the buffer is flushed when it has more
+            than max_pending cells.
+
+    Example:
+        >>> with CachedSheet(calcObject.get_sheet_by_name('Sheet1')) as sheetObject:
+        ...     for row in range(1000):
+        ...         x = get_cell_value(sheetObject, row, 0)
+        ...         set_cell_value(sheetObject, row, 1, f'={x}*2')
+    """
+
+    def __init__(self, sheetObject, calcObject=None, block_rows=256, block_cols=16,
+                 max_bytes=64*2**20, max_pending=100000):
+        self.sheetObject = sheetObject
+        self.calcObject = calcObject
+        self.block_rows = block_rows
+        self.block_cols = block_cols
+        self.max_bytes = max_bytes
+        self.max_pending = max_pending
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._blocks = OrderedDict()
+        self._pending = dict()
+        self._widths = dict()
+        self._heights = dict()
+        self._lock = threading.RLock()
+        _cached_sheets.add(self)
+
+    def __getattr__(self, name):
+        if name == 'sheetObject':
+            raise AttributeError(name)
+        return getattr(self.sheetObject, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.flush()
+
+    def _block(self, type, block_row, block_col):
+        key = (type, block_row, block_col)
+        block = self._blocks.get(key)
+        if block is not None:
+            self._blocks.move_to_end(key)
+            self.hits += 1
+            return block[0]
+        self.misses += 1
+        row_init = block_row*self.block_rows
+        col_init = block_col*self.block_cols
+        values = get_cells_value(self.sheetObject, row_init, col_init,
+                                 row_init+self.block_rows-1, col_init+self.block_cols-1, type=type)
+        nbytes = sys.getsizeof(values) + sum(sys.getsizeof(row) + sum(map(sys.getsizeof, row)) for row in values)
+        self._blocks[key] = (values, nbytes)
+        self.nbytes += nbytes
+        while self.nbytes > self.max_bytes and len(self._blocks) > 1:
+            _, (_, evicted) = self._blocks.popitem(last=False)
+            self.nbytes -= evicted
+        return values
+
+    def get_cell_value(self, row, col, type='formula'):
+        """Cached version of :py:func:`get_cell_value`."""
+        if type != 'formula' and type != 'data':
+            warnings.warn(f"type = {type} is not a valid option. Using type = 'data'.")
+            type = 'data'
+        with self._lock:
+            pending = self._pending.get((row, col))
+            if pending is not None:
+                if pending[1] == type:
+                    return pending[0] if type == 'formula' or pending[0] is None else str(pending[0])
+                self.flush()
+            values = self._block(type, row // self.block_rows, col // self.block_cols)
+            value = values[row % self.block_rows][col % self.block_cols]
+            if type == 'data' and not isinstance(value, str):
+                value = _uno_value(value, 'formula')  # text, as getString()
+            return value
+
+    def set_cell_value(self, row, col, value, type='formula'):
+        """Buffered version of :py:func:`set_cell_value`."""
+        if type != 'formula' and type != 'data':
+            warnings.warn(f"type = {type} is not a valid option. Using type = 'data'.")
+            type = 'data'
+        with self._lock:
+            self._pending[(row, col)] = (value, type)
+            if len(self._pending) > self.max_pending:
+                self.flush()
+
+    def get_col_width(self, col):
+        """Cached version of :py:func:`get_col_width`."""
+        if col not in self._widths:
+            self._widths[col] = get_col_width(self.sheetObject, col)
+        return self._widths[col]
+
+    def set_col_width(self, col, width):
+        """Write-through version of :py:func:`set_col_width`."""
+        set_col_width(self.sheetObject, col, width)
+        self._widths[col] = width
+
+    def get_row_height(self, row):
+        """Cached version of :py:func:`get_row_height`."""
+        if row not in self._heights:
+            self._heights[row] = get_row_height(self.sheetObject, row)
+        return self._heights[row]
+
+    def set_row_height(self, row, height):
+        """Write-through version of :py:func:`set_row_height`."""
+        set_row_height(self.sheetObject, row, height)
+        self._heights[row] = height
+
+    def flush(self):
+        """Write buffered cells with bulk range writes.
+
+        Returns:
+            number of write calls.
+        """
+        with self._lock:
+            if len(self._pending) == 0:
+                return 0
+            n_calls = 0
+            for type in ('formula', 'data'):
+                cells = dict()
+                for cell, (value, value_type) in self._pending.items():
+                    if value_type == type:
+                        if type == 'data' and value is not None:
+                            value = str(value)
+                        cells[cell] = value
+                n_calls += _write_cells(self.sheetObject, cells, type=type)
+            self._invalidate_cells(self._pending)
+            self._pending = dict()
+            return n_calls
+
+    def _invalidate_cells(self, cells):
+        blocks = {(row // self.block_rows, col // self.block_cols) for row, col in cells}
+        for key in list(self._blocks):
+            if key[1:] in blocks:
+                self.nbytes -= self._blocks.pop(key)[1]
+
+    def invalidate(self, row_init=None, col_init=None, row_final=None, col_final=None):
+        """Discard cached values (pending writes are kept).
+
+        Without arguments, the whole cache (including column widths and row
+        heights) is discarded. Otherwise, only blocks that overlap the range
+        are discarded (None means no limit).
+        """
+        with self._lock:
+            if row_init is None and col_init is None and row_final is None and col_final is None:
+                self._blocks.clear()
+                self._widths.clear()
+                self._heights.clear()
+                self.nbytes = 0
+                return
+            for key in list(self._blocks):
+                _, block_row, block_col = key
+                r0, c0 = block_row*self.block_rows, block_col*self.block_cols
+                r1, c1 = r0+self.block_rows-1, c0+self.block_cols-1
+                if ((row_init is None or r1 >= row_init) and (row_final is None or r0 <= row_final) and
+                    (col_init is None or c1 >= col_init) and (col_final is None or c0 <= col_final)):
+                    self.nbytes -= self._blocks.pop(key)[1]
+
+
+# %% office-free reading
+_ns = {'table':  'urn:oasis:names:tc:opendocument:xmlns:table:1.0',
+       'office': 'urn:oasis:names:tc:opendocument:xmlns:office:1.0',
+       'text':   'urn:oasis:names:tc:opendocument:xmlns:text:1.0',
+       'main':   'http://schemas.openxmlformats.org/spreadsheetml/2006/main',
+       'r':      'http://schemas.openxmlformats.org/officeDocument/2006/relationships',
+       'rel':    'http://schemas.openxmlformats.org/package/2006/relationships',
+      }
+
+
+def _tag(prefix, name):
+    return '{' + _ns[prefix] + '}' + name
+
+
+def _cell_position(reference):
+    """Return (row, col) of a cell reference, e.g., 'B3' -> (2, 1)."""
+    reference = reference.replace('$', '')
+    letters = reference.rstrip('0123456789')
+    col = 0
+    for letter in letters.upper():
+        col = col*26 + ord(letter) - 64
+    return int(reference[len(letters):]) - 1, col - 1
+
+
+def _serial_date(value):
+    """Convert an ISO date (or datetime) to a spreadsheet serial number."""
+    date = datetime.datetime.fromisoformat(value)
+    return (date - datetime.datetime(1899, 12, 30)).total_seconds()/86400
+
+
+def _serial_time(value):
+    """Convert an ISO duration ('PT12H30M00S') to a fraction of a day."""
+    match = re.fullmatch(r'-?P(?:(\d+)D)?T?(?:(\d+)H)?(?:(\d+)M)?(?:([\d.]+)S)?', value)
+    if match is None:
+        return 0.0
+    days, hours, minutes, seconds = (float(x) if x else 0.0 for x in match.groups())
+    return days + hours/24 + minutes/1440 + seconds/86400
+
+
+def _odf_formula(formula):
+    """Convert an ODF formula ('of:=[.A1]*2') to the form of getFormula ('=A1*2')."""
+    formula = formula[formula.index(':=') + 1:] if ':=' in formula[:5] else formula
+    return re.sub(r'\[([^\]]*)\]', lambda m: re.sub(r'(^|:)\.', r'\1', m.group(1)), formula)
+
+
+def _odf_text(elem):
+    """Return the text of a paragraph as libreoffice shows it.
+
+    Spaces (text:s), tabs, and line breaks are elements in ODF, not text.
+    """
+    parts = [elem.text or '']
+    for child in elem:
+        if child.tag == _tag('text', 's'):
+            parts.append(' '*int(child.get(_tag('text', 'c'), 1)))
+        elif child.tag == _tag('text', 'tab'):
+            parts.append('\t')
+        elif child.tag == _tag('text', 'line-break'):
+            parts.append('\n')
+        else:
+            parts.append(_odf_text(child))
+        parts.append(child.tail or '')
+    return ''.join(parts)
+
+
+def _read_ods(archive, name=None):
+    """Read cells of a sheet from content.xml (streaming).
+
+    Returns:
+        list of sheet names (up to the requested one) and cells
+        {row: {col: (data, formula, string)}} of the requested sheet.
+    """
+    table, row_tag = _tag('table', 'table'), _tag('table', 'table-row')
+    cell_tags = (_tag('table', 'table-cell'), _tag('table', 'covered-table-cell'))
+    a_name, a_rows, a_cols = _tag('table', 'name'), _tag('table', 'number-rows-repeated'), _tag('table', 'number-columns-repeated')
+    a_type, a_value, a_formula = _tag('office', 'value-type'), _tag('office', 'value'), _tag('table', 'formula')
+    a_date, a_time, a_bool = _tag('office', 'date-value'), _tag('office', 'time-value'), _tag('office', 'boolean-value')
+    p = _tag('text', 'p')
+
+    names = []
+    cells = dict()
+    active = False
+    row, col, row_cells = 0, 0, []
+    with archive.open('content.xml') as f:
+        for event, elem in ElementTree.iterparse(f, events=('start', 'end')):
+            if event == 'start':
+                if elem.tag == table:
+                    names.append(elem.get(a_name))
+                    active = name is None or names[-1] == name
+                    row = 0
+                elif elem.tag == row_tag:
+                    col, row_cells = 0, []
+                continue
+
+            if elem.tag in cell_tags:
+                repeat = int(elem.get(a_cols, 1))
+                if active:
+                    value_type = elem.get(a_type)
+                    formula = elem.get(a_formula)
+                    string = '\n'.join(_odf_text(e) for e in elem if e.tag == p)
+                    if value_type in ('float', 'percentage', 'currency'):
+                        data = float(elem.get(a_value))
+                    elif value_type == 'date':
+                        data = _serial_date(elem.get(a_date))
+                    elif value_type == 'time':
+                        data = _serial_time(elem.get(a_time))
+                    elif value_type == 'boolean':
+                        data = float(elem.get(a_bool) == 'true')
+                    elif value_type is not None:
+                        data = string
+                    else:
+                        data = string = ''
+                    if data != '' or formula is not None:
+                        if formula is not None:
+                            formula = _odf_formula(formula)
+                        elif value_type == 'boolean':
+                            formula = 'TRUE' if data else 'FALSE'
+                        else:
+                            formula = _uno_value(data, 'formula')
+                        for j in range(repeat):
+                            row_cells.append((col + j, (data, formula, string)))
+                col += repeat
+                elem.clear()
+            elif elem.tag == row_tag:
+                repeat = int(elem.get(a_rows, 1))
+                if active and row_cells:
+                    for i in range(repeat):
+                        cells[row + i] = dict(row_cells)
+                row += repeat
+                elem.clear()
+            elif elem.tag == table:
+                elem.clear()
+                if active and name is not None:
+                    break
+    return names, cells
+
+
+def _xlsx_sheets(archive):
+    """Return {sheet name: path of the sheet xml} in order."""
+    with archive.open('xl/_rels/workbook.xml.rels') as f:
+        targets = {rel.get('Id'): rel.get('Target') for rel in ElementTree.parse(f).getroot()}
+    sheets = dict()
+    with archive.open('xl/workbook.xml') as f:
+        for sheet in ElementTree.parse(f).getroot().iter(_tag('main', 'sheet')):
+            target = targets[sheet.get(_tag('r', 'id'))]
+            sheets[sheet.get('name')] = target.lstrip('/') if target.startswith('/') else 'xl/' + target
+    return sheets
+
+
+def _xlsx_strings(archive):
+    """Return the list of shared strings."""
+    if 'xl/sharedStrings.xml' not in archive.namelist():
+        return []
+    si, t, r = _tag('main', 'si'), _tag('main', 't'), _tag('main', 'r')
+    strings = []
+    with archive.open('xl/sharedStrings.xml') as f:
+        for event, elem in ElementTree.iterparse(f):
+            if elem.tag == si:
+                # plain text (t) or rich text runs (r/t); phonetic runs are skipped
+                strings.append(''.join(e.findtext(t, '') if e.tag == r else (e.text or '')
+                                       for e in elem if e.tag in (t, r)))
+                elem.clear()
+    return strings
+
+
+def _read_xlsx(archive, path, strings):
+    """Read cells of a sheet xml (streaming).
+
+    Returns:
+        cells {row: {col: (data, formula, string)}}.
+    """
+    c_tag, row_tag = _tag('main', 'c'), _tag('main', 'row')
+    v_tag, f_tag, is_tag, t_tag = _tag('main', 'v'), _tag('main', 'f'), _tag('main', 'is'), _tag('main', 't')
+
+    cells = dict()
+    row, col = -1, -1
+    with archive.open(path) as f:
+        for event, elem in ElementTree.iterparse(f, events=('start', 'end')):
+            if event == 'start':
+                if elem.tag == row_tag:
+                    row = int(elem.get('r', row + 2)) - 1
+                    col = -1
+                continue
+            if elem.tag == c_tag:
+                reference = elem.get('r')
+                col = _cell_position(reference)[1] if reference else col + 1
+                cell_type = elem.get('t', 'n')
+                value = elem.findtext(v_tag)
+                formula = elem.findtext(f_tag)
+                if cell_type == 's':
+                    data = strings[int(value)]
+                elif cell_type == 'inlineStr':
+                    data = ''.join(elem.find(is_tag).itertext()) if elem.find(is_tag) is not None else ''
+                elif value is None:
+                    data = ''
+                elif cell_type in ('str', 'e'):
+                    data = value
+                else:
+                    data = float(value)
+                if data != '' or formula:
+                    if cell_type == 'b':
+                        string = 'TRUE' if data else 'FALSE'
+                    else:
+                        string = data if isinstance(data, str) else _uno_value(data, 'formula')
+                    cells.setdefault(row, dict())[col] = (data, '=' + formula if formula else string, string)
+                elem.clear()
+            elif elem.tag == row_tag:
+                elem.clear()
+    return cells
+
+
+class CalcFile(object):
+    """Read-only .ods or .xlsx file, read without libreoffice.
+
+    Sheets are parsed from the zip archive with a streaming xml parser, only
+    when requested. Sheets (:py:class:`FileSheet`) can be used in place of
+    sheet objects by the reading functions of this module
+    (:py:func:`get_cells_value`, :py:func:`read_range_array`,
+    :py:func:`get_used_area`, :py:func:`loadCalc`, ...). Formula cells return
+    the result cached in the file as data.
+
+    :py:func:`loadCalc`, :py:func:`get_id`, and :py:func:`get_group` use this
+    class if a file path is given in place of a Calc object.
+
+    Args:
+        filepath (str or pathlib.Path): .ods or .xlsx file.
+
+    Example:
+        >>> sheetObject, parameters = loadCalc('Sheet1', 'parameters.ods')
+        >>>
+        >>> calcFile = CalcFile('results.xlsx')
+        >>> array = read_range_array(calcFile.get_sheet_by_index(0), 0, 0, 99, 3)
+    """
+
+    def __init__(self, filepath):
+        self.filepath = Path(filepath)
+        self.suffix = self.filepath.suffix.lower()
+        if self.suffix not in ('.ods', '.xlsx'):
+            raise ValueError(f'Cannot read {self.filepath.name} without libreoffice (only .ods and .xlsx files).')
+        self._names = None
+        self._sheets = dict()
+        self._strings = None
+
+    @property
+    def sheet_names(self):
+        """Tuple with the sheet names."""
+        if self._names is None:
+            with zipfile.ZipFile(self.filepath) as archive:
+                if self.suffix == '.ods':
+                    self._names = tuple(_read_ods(archive, name='')[0])
+                else:
+                    self._names = tuple(_xlsx_sheets(archive))
+        return self._names
+
+    def get_sheet_by_name(self, name):
+        """Return a :py:class:`FileSheet` (parsed on first use)."""
+        if name not in self._sheets:
+            self._sheets[name] = FileSheet(self, name)
+        return self._sheets[name]
+
+    def get_sheet_by_index(self, index):
+        """Return a :py:class:`FileSheet` (parsed on first use)."""
+        return self.get_sheet_by_name(self.sheet_names[index])
+
+    def read_sheet(self, name):
+        """Parse a sheet. Returns {row: {col: (data, formula, string)}} of non-empty cells."""
+        with zipfile.ZipFile(self.filepath) as archive:
+            if self.suffix == '.ods':
+                names, cells = _read_ods(archive, name=name)
+                if name not in names:
+                    raise KeyError(f'{name} is not a sheet of {self.filepath.name}')
+            else:
+                sheets = _xlsx_sheets(archive)
+                if name not in sheets:
+                    raise KeyError(f'{name} is not a sheet of {self.filepath.name}')
+                if self._strings is None:
+                    self._strings = _xlsx_strings(archive)
+                cells = _read_xlsx(archive, sheets[name], self._strings)
+        return cells
+
+    def close(self, deliver=True):
+        """Release parsed sheets (same call as a Calc object, see :py:func:`closeCalc`)."""
+        self._sheets = dict()
+        self._strings = None
+
+
+class FileSheet(object):
+    """Read-only sheet of a :py:class:`CalcFile`.
+
+    The sheet is parsed on first use.
+
+    Args:
+        calcFile (CalcFile): file of the sheet.
+        name (str): sheet name.
+    """
+
+    _empty = ('', '', '')
+
+    def __init__(self, calcFile, name):
+        self.calcFile = calcFile
+        self.name = name
+        self._cells = None
+
+    @property
+    def cells(self):
+        """{row: {col: (data, formula, string)}} of non-empty cells."""
+        if self._cells is None:
+            self._cells = self.calcFile.read_sheet(self.name)
+        return self._cells
+
+    def getName(self):
+        return self.name
+
+    def get_used_area(self):
+        """Return (last_row, last_col) of the cells with content."""
+        last_row = max(self.cells, default=0)
+        last_col = max((max(row) for row in self.cells.values() if row), default=0)
+        return last_row, last_col
+
+    def get_cell_value(self, row, col, type='formula'):
+        """Same as :py:func:`get_cell_value` ('data' returns the text of the cell)."""
+        k = 1 if type == 'formula' else 2
+        return self.cells.get(row, {}).get(col, self._empty)[k]
+
+    def get_cells_value(self, row_init, col_init, row_final, col_final, type='data'):
+        """Same as :py:func:`get_cells_value`."""
+        if type != 'data' and type != 'formula':
+            warnings.warn(f"type = {type} is not a valid option. Using type = 'data'.")
+            type = 'data'
+        k = 0 if type == 'data' else 1
+        empty = self._empty
+        rows = []
+        for row in range(row_init, row_final+1):
+            cells = self.cells.get(row)
+            if cells is None:
+                rows.append(('', )*(col_final - col_init + 1))
+            else:
+                rows.append(tuple(cells.get(col, empty)[k] for col in range(col_init, col_final+1)))
+        return tuple(rows)
+
+    def last_content(self, col_init, row_init, col_final, row_final, end='EndRow'):
+        """Last row (or column, end='EndColumn') with content in a range, -1 if empty."""
+        found = [(row, col) for row, cells in self.cells.items() if row_init <= row <= row_final
+                 for col in cells if col_init <= col <= col_final]
+        return max((row if end == 'EndRow' else col for row, col in found), default=-1)
+
+
+@functools.lru_cache(maxsize=8)
+def _calc_file(filepath, mtime, size):
+    return CalcFile(filepath)
+
+
+def _sheet_object(sheet, calcObject=None):
+    """Return the sheet object of a sheet (name or object).
+
+    If calcObject is a file path, the sheet is read from the file without
+    libreoffice (see :py:class:`CalcFile`). Parsed files are reused while the
+    file does not change.
+    """
+    if isinstance(calcObject, (str, Path)):
+        filepath = Path(calcObject).resolve()
+        stat = filepath.stat()
+        calcObject = _calc_file(filepath, stat.st_mtime_ns, stat.st_size)
+    if type(sheet) == str:
+        return calcObject.get_sheet_by_name(sheet)
+    return sheet
+
+
+# %% parameter cache
+_cache_dir = Path(os.environ.get('PYCALC_CACHE',
+                                 Path(os.environ.get('XDG_CACHE_HOME', Path.home() / '.cache')) / 'pyCalc'))
+_cache_max_bytes = 256*2**20
+_cache_version = 1
+_cache_memory = OrderedDict()
+
+
+@functools.lru_cache(maxsize=256)
+def _content_hash(filepath, mtime, size):
+    """Hash of the content of a file (computed once per file version)."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(2**20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _path_key(filepath):
+    return hashlib.blake2b(str(filepath).encode(), digest_size=8).hexdigest()
+
+
+def _cache_entry(filepath, sheet_name):
+    """Return the cache file of a sheet of a file (path, mtime, size, content, and sheet)."""
+    filepath = Path(filepath).resolve()
+    try:
+        stat = filepath.stat()
+    except OSError:
+        return None
+    content = _content_hash(filepath, stat.st_mtime_ns, stat.st_size)
+    key = f'{_cache_version}|{filepath}|{stat.st_mtime_ns}|{stat.st_size}|{content}|{sheet_name}'
+    return _cache_dir / f'{_path_key(filepath)}_{hashlib.blake2b(key.encode(), digest_size=16).hexdigest()}.npz'
+
+
+def _document_path(calcObject, unmodified=True):
+    """Return the file of a saved document (None otherwise).
+
+    If unmodified is True, None is also returned for documents with unsaved
+    changes.
+    """
+    if isinstance(calcObject, CalcFile):
+        return calcObject.filepath
+    try:
+        url = calcObject.Location
+        if url == '' or (unmodified and calcObject.isModified()):
+            return None
+        return Path(uno.fileUrlToSystemPath(url))
+    except Exception:
+        return None
+
+
+def _parameter_cache_file(sheet, sheetObject, calcObject=None):
+    """Return the cache file for loadCalc (None if it cannot be cached)."""
+    if isinstance(sheetObject, FileSheet):
+        return _cache_entry(sheetObject.calcFile.filepath, sheetObject.name)
+    if calcObject is None:
+        return None
+    filepath = _document_path(calcObject)
+    if filepath is None:
+        return None
+    return _cache_entry(filepath, sheet if type(sheet) == str else sheetObject.getName())
+
+
+def _cache_load(cacheFile):
+    """Read a cached parameter table (None if missing or broken).
+
+    Tables read in this process are also kept in memory. The table is shared,
+    so it must not be changed.
+    """
+    table = _cache_memory.get(cacheFile)
+    if table is not None:
+        _cache_memory.move_to_end(cacheFile)
+        return table
+    try:
+        with np.load(cacheFile, allow_pickle=False) as npz:
+            meta = json.loads(str(npz['meta']))
+            numeric = npz['numeric']
+    except FileNotFoundError:
+        return None
+    except Exception:
+        _cache_remove(cacheFile)
+        return None
+    table = np.empty(meta['length'], dtype=[(field, numeric.dtype[field] if field in numeric.dtype.names else object)
+                                            for field in meta['fields']])
+    for field in numeric.dtype.names:
+        table[field] = numeric[field]
+    for field, values in meta['objects'].items():
+        table[field] = values
+    try:
+        os.utime(cacheFile)  # least recently used is evicted first
+    except OSError:
+        pass
+    _cache_remember(cacheFile, table)
+    return table
+
+
+def _cache_remember(cacheFile, table):
+    _cache_memory[cacheFile] = table
+    while len(_cache_memory) > 32:
+        _cache_memory.popitem(last=False)
+
+
+def _cache_save(cacheFile, table):
+    """Write a parameter table to the cache (atomic, so other processes never read partial files)."""
+    fields = table.dtype.names
+    meta = dict(length=len(table), fields=fields,
+                objects={field: table[field].tolist() for field in fields if table[field].dtype == object})
+    numeric = np.empty(len(table), dtype=[(field, table.dtype[field]) for field in fields
+                                          if table.dtype[field] != object])
+    for field in numeric.dtype.names:
+        numeric[field] = table[field]
+    try:
+        _cache_dir.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=_cache_dir, suffix='.tmp', delete=False) as f:
+            np.savez(f, meta=np.array(json.dumps(meta)), numeric=numeric)
+        os.replace(f.name, cacheFile)
+    except OSError as e:
+        warnings.warn(f'Cannot write parameter cache: {e!r}')
+        return
+    _cache_remember(cacheFile, table)
+    _cache_evict()
+
+
+def _cache_remove(cacheFile):
+    _cache_memory.pop(cacheFile, None)
+    try:
+        os.remove(cacheFile)
+    except OSError:
+        pass
+
+
+def _cache_evict(max_bytes=None):
+    """Remove the least recently used cache files above max_bytes."""
+    max_bytes = _cache_max_bytes if max_bytes is None else max_bytes
+    entries = []
+    for path in _cache_dir.glob('*.npz'):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        _cache_remove(path)
+        total -= size
+
+
+def _invalidate_cache(filepath):
+    """Remove the cache files of a file (all sheets and versions)."""
+    if filepath is None or not _cache_dir.exists():
+        return
+    for path in _cache_dir.glob(f'{_path_key(Path(filepath).resolve())}_*.npz'):
+        _cache_remove(path)
+
+
+def clear_cache(filepath=None):
+    """Remove cached parameters (see :py:func:`loadCalc`).
+
+    The cache folder is ``~/.cache/pyCalc`` (or the environment variable
+    ``PYCALC_CACHE``). Entries are keyed by file path, modification time,
+    size, content, and sheet name, so changed files are never read from the
+    cache. The least recently used entries are removed when the cache is
+    larger than 256 MB.
+
+    Args:
+        filepath (str or pathlib.Path, optional): if given, only entries of
+            this file are removed.
+    """
+    if filepath is not None:
+        _invalidate_cache(filepath)
+    elif _cache_dir.exists():
+        for path in _cache_dir.glob('*.npz'):
+            _cache_remove(path)
+
+
 # %% specific
 def get_id(sheet, calcObject=None):
 
-    if type(sheet) == str:
-        sheetObject = calcObject.get_sheet_by_name(sheet)
-    else:
-        sheetObject = sheet
+    sheetObject = _sheet_object(sheet, calcObject)
 
     # get id_list
-    stop = False
-    id_list = []
-    row = 1
-    while stop == False:
-        id = sheetObject.get_cell_range_by_position(1, row, 1, row).getDataArray()
-
-        if id[0][0] == '':
-            stop = True
-        else:
-            id_list.append(id[0][0])
-            row += 1
-    return id_list
+    return get_column_values(sheetObject, 1, row_init=1)
+
+
+_parameter_fields = ('group', 'id', 'description', 'dummy', 'min', 'guess', 'max', 'fit', 'error', 'warning', 'comments')
+_parameter_blank = {'min': -float('inf'), 'guess': 0, 'max': float('inf'), 'fit': float('nan'), 'error': float('nan')}
+
+
+def _parameter_column(values, blank=float('nan')):
+    """Convert a numeric column of a parameter sheet to a float array.
+
+    'inf', '-inf', and blank cells are converted in a vectorized way. If the
+    column has other text, an object array is returned.
+    """
+    column = np.array(values, dtype=object)
+    column[column == ''] = blank
+    column[column == 'inf'] = np.inf
+    column[column == '-inf'] = -np.inf
+    try:
+        return column.astype(float)
+    except (ValueError, TypeError):
+        return column
 
 
-def loadCalc(sheet, calcObject=None):
+def loadCalc(sheet, calcObject=None, flat=False, cache=False):
     """Load xlsx file with fit parameters.
 
+    The sheet is read with a single call and rows are grouped in a single
+    pass. 'inf' and '-inf' are converted to np.inf and -np.inf, and blank
+    cells in min, max, and guess are converted to -np.inf, np.inf, and 0,
+    respectively (blank fit and error become NaN).
+
     Args:
-        calcObject (Calc object): Object created by connect2calc().
-        filename (str or pathlib.Path): path to xlsx file.
+        sheet (str or sheet object): sheet name or sheet object.
+        calcObject (Calc object, str, or pathlib.Path, optional): Object
+            created by connect2calc(). Required if sheet is a name. If a path
+            to an .ods or .xlsx file, the file is read without libreoffice
+            (see :py:class:`CalcFile`).
+        flat (bool, optional): if True, also returns a structured array with
+            all parameters (sorted by group) and the fields 'row' (sheet row),
+            'group', 'id', ..., 'comments'.
+        cache (bool, optional): if True, parameters are kept in an on-disk
+            cache and read from it while the file does not change (see
+            :py:func:`clear_cache`). Only used for saved, unmodified
+            documents and for files read without libreoffice.
 
     Returns:
-        parameter dictionary.
+        sheet object, parameter dictionary (and structured array, if
+        ``flat=True``).
+
+        The numeric fields of the parameter dictionary ('min', 'guess', 'max',
+        'fit', and 'error') are arrays that are views of the structured array,
+        so changes in one are seen in the other.
     """
 
     # connect to sheet
-    if type(sheet) == str:
-        sheetObject = calcObject.get_sheet_by_name(sheet)
+    sheetObject = _sheet_object(sheet, calcObject)
+
+    cacheFile = _parameter_cache_file(sheet, sheetObject, calcObject) if cache else None
+    table = None if cacheFile is None else _cache_load(cacheFile)
+    if table is None:
+        table = _parameter_table(sheetObject)
+        if cacheFile is not None:
+            _cache_save(cacheFile, table)
+    snapshot, table = table, table.copy()
+    parameters, group_rows = _parameter_dict(table)
+
+    # state for incremental update_xlsx
+    _remember(sheetObject, group_rows, snapshot)
+
+    if flat:
+        return sheetObject, parameters, table
+    return sheetObject, parameters
+
+
+def _parameter_table(sheetObject):
+    """Read a parameter sheet into a structured array (sorted by group)."""
+    last_row, last_col = get_used_area(sheetObject)
+    values = []
+    if last_row > 0:
+        for row in get_cells_value(sheetObject, 1, 0, last_row, 10):
+            if row[0] == '' or row[1] == '':
+                break
+            values.append(row)
+
+    # separate data by group (in a single pass)
+    group_index = dict()
+    for i, row in enumerate(values):
+        group_index.setdefault(row[0], []).append(i)
+    order = [i for rows in group_index.values() for i in rows]
+
+    if len(values) > 0:
+        columns = list(zip(*[values[i] for i in order]))
     else:
-        sheetObject = sheet
+        columns = [()]*len(_parameter_fields)
+    data = dict(row=np.array(order, dtype=int) + 1)
+    for j, field in enumerate(_parameter_fields):
+        if field in _parameter_blank:
+            data[field] = _parameter_column(columns[j], _parameter_blank[field])
+        else:
+            data[field] = np.array(columns[j], dtype=object)
 
-    # get data
-    id_list = get_id(sheetObject)
-    values = sheetObject.get_cell_range_by_position(0, 0, 10, len(id_list)+1).getDataArray()
+    table = np.empty(len(values), dtype=[(field, data[field].dtype) for field in data])
+    for field in data:
+        table[field] = data[field]
+    return table
 
-    # separate data by group
-    group_rows = get_group_rows(sheetObject)
-    parameters = dict()
-    for group in group_rows:
-        for item, row in enumerate([group]):
-            parameters[group] = dict()
-            parameters[group]['id']          = [values[i][1] for i in range(1, len(values)) if values[i][0] == group]
-            parameters[group]['description'] = [values[i][2] for i in range(1, len(values)) if values[i][0] == group]
-            parameters[group]['dummy']       = [values[i][3] for i in range(1, len(values)) if values[i][0] == group]
-            parameters[group]['min']         = [values[i][4] for i in range(1, len(values)) if values[i][0] == group]
-            parameters[group]['guess']       = [values[i][5] for i in range(1, len(values)) if values[i][0] == group]
-            parameters[group]['max']         = [values[i][6] for i in range(1, len(values)) if values[i][0] == group]
-            parameters[group]['fit']         = [values[i][7] for i in range(1, len(values)) if values[i][0] == group]
-            parameters[group]['error']       = [values[i][8] for i in range(1, len(values)) if values[i][0] == group]
-            parameters[group]['warning']     = [values[i][9] for i in range(1, len(values)) if values[i][0] == group]
-            parameters[group]['comments']    = [values[i][10] for i in range(1, len(values)) if values[i][0] == group]
-
-    fixInf(parameters)
-    fixNone(parameters)
 
-    return sheetObject, parameters
+def _parameter_dict(table):
+    """Return the parameter dictionary and the sheet rows of each group.
+
+    Numeric fields are views of table.
+    """
+    bounds = dict()
+    for i, group in enumerate(table['group'].tolist()):
+        bounds.setdefault(group, [i, i])[1] = i + 1
+
+    rows = table['row'].tolist()
+    columns = {field: table[field] if field in _parameter_blank else table[field].tolist()
+               for field in _parameter_fields[1:]}
+    parameters = dict()
+    group_rows = dict()
+    for group, (start, stop) in bounds.items():
+        group_rows[group] = rows[start:stop]
+        parameters[group] = {field: column[start:stop] for field, column in columns.items()}
+    return parameters, group_rows
 
 
 def fixInf(parameters):
@@ -494,32 +2974,15 @@ def fixNone(parameters):
 
 def get_group(sheet, calcObject=None):
 
-    if type(sheet) == str:
-        sheetObject = calcObject.get_sheet_by_name(sheet)
-    else:
-        sheetObject = sheet
+    sheetObject = _sheet_object(sheet, calcObject)
 
-    # get id_list
-    stop = False
-    group_list = []
-    row = 1
-    while stop == False:
-        group = sheetObject.get_cell_range_by_position(0, row, 0, row).getDataArray()
-
-        if group[0][0] == '':
-            stop = True
-        else:
-            group_list.append(group[0][0])
-            row += 1
-    return group_list
+    # get group_list
+    return get_column_values(sheetObject, 0, row_init=1)
 
 
 def get_group_rows(sheet, calcObject=None):
 
-    if type(sheet) == str:
-        sheetObject = calcObject.get_sheet_by_name(sheet)
-    else:
-        sheetObject = sheet
+    sheetObject = _sheet_object(sheet, calcObject)
 
     group_list = get_group(sheetObject)
     group_rows = dict()
@@ -528,7 +2991,148 @@ def get_group_rows(sheet, calcObject=None):
     return group_rows
 
 
-def update_xlsx(parameters, sheet, calcObject=None):
+def _parameter_grid(parameters, group_rows):
+    """Return the cells {(row, col): formula} that update_xlsx writes."""
+    grid = dict()
+    for group, rows in group_rows.items():
+        for col, field in enumerate(_parameter_fields[1:], start=1):
+            column = parameters[group][field]
+            for item, row in enumerate(rows):
+                grid[(row, col)] = _uno_value(column[item], 'formula')
+    return grid
+
+
+def _read_parameter_grid(sheetObject):
+    """Read group rows and cells {(row, col): formula} of a parameter sheet (one call)."""
+    last_row, last_col = get_used_area(sheetObject)
+    group_rows = dict()
+    grid = dict()
+    if last_row > 0:
+        for row, values in enumerate(get_cells_value(sheetObject, 1, 0, last_row, 10, type='formula'), start=1):
+            if values[0] == '' or values[1] == '':
+                break
+            group_rows.setdefault(values[0], []).append(row)
+            for col in range(1, len(_parameter_fields)):
+                grid[(row, col)] = values[col]
+    return group_rows, grid
+
+
+def _remember(sheetObject, group_rows, grid):
+    """Store the state of a parameter sheet for the next update_xlsx.
+
+    grid is the dict of cells (see :py:func:`_parameter_grid`) or a copy of
+    the table read by :py:func:`loadCalc`, converted only if needed.
+    """
+    try:
+        _snapshots[sheetObject] = (group_rows, grid)
+    except TypeError:
+        pass
+
+
+def _cell_rectangles(cells):
+    """Merge cells into rectangles.
+
+    Args:
+        cells (iterable): (row, col) of each cell.
+
+    Returns:
+        list of [row_init, col_init, row_final, col_final] (inclusive).
+    """
+    by_row = dict()
+    for row, col in cells:
+        by_row.setdefault(row, []).append(col)
+
+    rectangles = []
+    open_runs = dict()
+    previous_row = None
+    for row in sorted(by_row):
+        cols = sorted(by_row[row])
+        runs = dict()
+        first = 0
+        for i in range(1, len(cols)+1):
+            if i == len(cols) or cols[i] != cols[i-1] + 1:
+                run = (cols[first], cols[i-1])
+                rectangle = open_runs.get(run) if previous_row == row - 1 else None
+                if rectangle is None:
+                    rectangle = [row, run[0], row, run[1]]
+                    rectangles.append(rectangle)
+                else:
+                    rectangle[2] = row
+                runs[run] = rectangle
+                first = i
+        open_runs = runs
+        previous_row = row
+    return rectangles
+
+
+def _write_cells(sheetObject, cells, type='formula'):
+    """Write cells {(row, col): value} merged into rectangles (one call each).
+
+    Returns:
+        number of write calls.
+    """
+    n_calls = 0
+    for r0, c0, r1, c1 in _cell_rectangles(cells):
+        block = [[cells[(row, col)] for col in range(c0, c1+1)] for row in range(r0, r1+1)]
+        set_cells_value(sheetObject, r0, c0, block, type=type)
+        n_calls += 1
+    return n_calls
+
+
+def _write_dirty_cells(sheetObject, target, snapshot):
+    """Write cells of target that differ from snapshot, merged into rectangles.
+
+    Returns:
+        number of write calls.
+    """
+    dirty = {cell: value for cell, value in target.items() if snapshot.get(cell, None) != value}
+    return _write_cells(sheetObject, dirty, type='formula')
+
+
+_snapshots = weakref.WeakKeyDictionary()
+
+
+def _drop_snapshot(sheetObject, compare=False):
+    """Drop the update_xlsx state of a sheet (see :py:func:`_remember`).
+
+    With compare=True, states stored with other objects of the same sheet
+    (e.g., the sheet was given by name) are dropped too.
+    """
+    try:
+        _snapshots.pop(sheetObject, None)
+    except TypeError:
+        pass
+    if compare and len(_snapshots) > 0:
+        raw = _raw(sheetObject)
+        for key in list(_snapshots.keys()):
+            try:
+                same = _raw(key) == raw
+            except Exception:
+                same = True
+            if same:
+                _snapshots.pop(key, None)
+
+
+def update_xlsx(parameters, sheet, calcObject=None, cached=False):
+    """Write parameters back to the sheet.
+
+    The sheet is read with a single call and only cells that differ from the
+    parameters are written. Changed cells are merged into rectangles and each
+    rectangle is written with a single call.
+
+    Args:
+        parameters (dict): parameter dictionary (see :py:func:`loadCalc`).
+        sheet (str or sheet object): sheet name or sheet object.
+        calcObject (Calc object, optional): Object created by connect2calc().
+            Required if sheet is a name.
+        cached (bool, optional): if True, the sheet is not read. Cells are
+            compared with the state left by the last :py:func:`loadCalc` or
+            update_xlsx with the same sheet object instead (the sheet is read
+            if there is none). The state is dropped by the pyCalc write
+            functions, but not by edits made by other means (user, macros,
+            other sheet objects), so use it only if the sheet is changed by
+            update_xlsx alone, e.g., inside a fit loop.
+    """
 
     # connect to sheet
     if type(sheet) == str:
@@ -536,33 +3140,286 @@ def update_xlsx(parameters, sheet, calcObject=None):
     else:
         sheetObject = sheet
 
-    group_rows = get_group_rows(sheetObject)
+    state = None
+    if cached:
+        try:
+            state = _snapshots.get(sheetObject)
+        except TypeError:
+            pass
+    if state is None:
+        state = _read_parameter_grid(sheetObject)
+    group_rows, snapshot = state
+    if isinstance(snapshot, np.ndarray):
+        snapshot = _parameter_grid(_parameter_dict(snapshot)[0], group_rows)
+
+    target = _parameter_grid(parameters, group_rows)
+    _write_dirty_cells(sheetObject, target, snapshot)
+    _remember(sheetObject, group_rows, target)
+    if calcObject is not None:
+        _invalidate_cache(_document_path(calcObject, unmodified=False))
+
+
+class ParameterIndex(object):
+    """Position of each parameter and field of a parameter sheet.
+
+    Rows are found from the 'group' and 'id' columns and columns from the
+    names in the header row (first row), so the layout does not need to
+    follow the default column order. The index is built with a few calls and
+    reused by :py:func:`get_param`, :py:func:`set_param`, and
+    :py:func:`set_params` until rows are inserted or removed, or
+    :py:meth:`refresh` is called. Both functions check that the rows still
+    hold the parameters (in the same call that reads the value, or with one
+    read of the group and id columns before writing) and refresh the index
+    otherwise.
 
-    for group in group_rows:
-        for item, row in enumerate(group_rows[group]):
-            sheetObject.set_rows_formula(1, row, [parameters[group]['id'][item], ])
-            sheetObject.set_rows_formula(2, row, [parameters[group]['description'][item], ])
-            sheetObject.set_rows_formula(3, row, [parameters[group]['dummy'][item], ])
+    Args:
+        sheetObject (sheet object): parameter sheet.
 
-            if parameters[group]['min'][item] == -np.inf:
-                sheetObject.set_rows_formula(4, row, ['-inf', ])
-            else:
-                sheetObject.set_rows_formula(4, row, [parameters[group]['min'][item], ])
+    Attributes:
+        rows (dict): {(group, id): row}.
+        columns (dict): {field: col}, e.g., {'group': 0, 'id': 1, ...}.
+    """
 
-            sheetObject.set_rows_formula(5, row, [parameters[group]['guess'][item], ])
+    def __init__(self, sheetObject):
+        self.sheetObject = sheetObject
+        self.rows = dict()
+        self.columns = dict()
+        self.refresh()
+
+    def refresh(self):
+        """Read the header row and the group and id columns again."""
+        last_row, last_col = get_used_area(self.sheetObject)
+        header = get_cells_value(self.sheetObject, 0, 0, 0, last_col, type='data')[0]
+        self.columns = dict()
+        for col, name in enumerate(header):
+            name = str(name).strip().lower()
+            if name != '' and name not in self.columns:
+                self.columns[name] = col
+
+        col_group, col_id = self.columns.get('group', 0), self.columns.get('id', 1)
+        c0, c1 = min(col_group, col_id), max(col_group, col_id)
+        self.rows = dict()
+        if last_row > 0:
+            for row, values in enumerate(get_cells_value(self.sheetObject, 1, c0, last_row, c1, type='data'), start=1):
+                group, id = values[col_group - c0], values[col_id - c0]
+                if group == '' or id == '':
+                    break
+                self.rows.setdefault((group, id), row)
+
+    def cell(self, group, id, field):
+        """Return (row, col) of a parameter field."""
+        try:
+            row = self.rows[(group, id)]
+        except KeyError:
+            raise KeyError(f'Parameter (group={group!r}, id={id!r}) not found.') from None
+        try:
+            col = self.columns[field]
+        except KeyError:
+            raise KeyError(f'Field {field!r} not found in the header: {list(self.columns)}.') from None
+        return row, col
 
-            if parameters[group]['max'][item] == np.inf:
-                sheetObject.set_rows_formula(6, row, ['inf', ])
-            else:
-                sheetObject.set_rows_formula(6, row, [parameters[group]['max'][item], ])
 
-            sheetObject.set_rows_formula(7, row, [parameters[group]['fit'][item], ])
-            sheetObject.set_rows_formula(8, row, [parameters[group]['error'][item], ])
-            sheetObject.set_rows_formula(9, row, [parameters[group]['warning'][item], ])
-            sheetObject.set_rows_formula(10, row, [parameters[group]['comments'][item], ])
+# sheetObject: ParameterIndex, or calcObject: {sheet name: ParameterIndex}
+_indexes = weakref.WeakKeyDictionary()
 
 
-def group_color(sheet, calcObject=None):
+def get_parameter_index(sheet, calcObject=None, refresh=False):
+    """Return the :py:class:`ParameterIndex` of a parameter sheet.
+
+    The index is built on the first call and reused afterwards.
+
+    Args:
+        sheet (str or sheet object): sheet name or sheet object.
+        calcObject (Calc object, optional): Object created by connect2calc().
+            Required if sheet is a name.
+        refresh (bool, optional): if True, the index is built again.
+    """
+    sheetObject = None
+    if isinstance(sheet, str) and not isinstance(calcObject, (str, Path)):
+        indexes = _indexes.setdefault(calcObject, dict())
+        key = sheet
+    else:
+        sheetObject = _sheet_object(sheet, calcObject)
+        indexes = _indexes
+        key = sheetObject
+
+    index = indexes.get(key)
+    if index is None:
+        if sheetObject is None:
+            sheetObject = _sheet_object(sheet, calcObject)
+        index = indexes[key] = ParameterIndex(sheetObject)
+    elif refresh:
+        index.refresh()
+    return index
+
+
+def _parameter_value(value, field):
+    """Convert a cell value as :py:func:`loadCalc` does ('inf', blank cells, ...)."""
+    if field in _parameter_blank:
+        return _parameter_column([value], _parameter_blank[field])[0]
+    return value
+
+
+def get_param(sheet, group, id, field='fit', calcObject=None):
+    """Read one field of one parameter.
+
+    A single range (the row of the parameter, from group/id to field) is read.
+    If the row does not hold the parameter anymore (rows were inserted or
+    removed), the index is refreshed and the cell is read again.
+
+    Args:
+        sheet (str or sheet object): sheet name or sheet object.
+        group, id (str): parameter group and id.
+        field (str, optional): column name ('min', 'guess', 'max', 'fit',
+            'error', ...).
+        calcObject (Calc object, optional): Object created by connect2calc().
+            Required if sheet is a name.
+
+    Returns:
+        value. Numeric fields are converted as in :py:func:`loadCalc`.
+    """
+    index = get_parameter_index(sheet, calcObject)
+    for attempt in range(2):
+        if attempt == 1 or (group, id) not in index.rows:
+            index.refresh()
+        row, col = index.cell(group, id, field)
+        col_group, col_id = index.columns.get('group', 0), index.columns.get('id', 1)
+        c0, c1 = min(col_group, col_id, col), max(col_group, col_id, col)
+        values = get_cells_value(index.sheetObject, row, c0, row, c1, type='data')[0]
+        if values[col_group - c0] == group and values[col_id - c0] == id:
+            return _parameter_value(values[col - c0], field)
+    raise KeyError(f'Parameter (group={group!r}, id={id!r}) not found.')
+
+
+def _rows_match(index, keys):
+    """Return True if the rows of the index still hold the parameters (one call).
+
+    Args:
+        index (ParameterIndex): index.
+        keys (list): (group, id) of each parameter (all in index.rows).
+    """
+    if len(keys) == 0:
+        return True
+    rows = [index.rows[key] for key in keys]
+    col_group, col_id = index.columns.get('group', 0), index.columns.get('id', 1)
+    c0, c1 = min(col_group, col_id), max(col_group, col_id)
+    r0, r1 = min(rows), max(rows)
+    values = get_cells_value(index.sheetObject, r0, c0, r1, c1, type='data')
+    for (group, id), row in zip(keys, rows):
+        if values[row - r0][col_group - c0] != group or values[row - r0][col_id - c0] != id:
+            return False
+    return True
+
+
+def _forget(sheetObject, calcObject=None):
+    """Drop the update_xlsx state and the cache of a sheet changed by other means."""
+    _drop_snapshot(sheetObject, compare=True)
+    if calcObject is not None and not isinstance(calcObject, (str, Path)):
+        _invalidate_cache(_document_path(calcObject, unmodified=False))
+
+
+def set_param(sheet, group, id, value, field='fit', calcObject=None):
+    """Write one field of one parameter (a single cell).
+
+    Args:
+        sheet (str or sheet object): sheet name or sheet object.
+        group, id (str): parameter group and id.
+        value (number or str): value. np.inf, NaN, and None are written as in
+            :py:func:`update_xlsx`.
+        field (str, optional): column name ('min', 'guess', 'max', 'fit',
+            'error', ...).
+        calcObject (Calc object, optional): Object created by connect2calc().
+            Required if sheet is a name.
+    """
+    set_params(sheet, {(group, id, field): value}, calcObject)
+
+
+def set_params(sheet, updates, calcObject=None):
+    """Write many parameter fields.
+
+    The group and id columns of the rows are read with a single call to check
+    the index (see :py:class:`ParameterIndex`). Cells are merged into
+    rectangles and each rectangle is written with a single call.
+
+    Args:
+        sheet (str or sheet object): sheet name or sheet object.
+        updates (dict): {(group, id, field): value}.
+        calcObject (Calc object, optional): Object created by connect2calc().
+            Required if sheet is a name.
+
+    Example:
+        >>> set_params('Sheet1', {('g1', 'p1', 'fit'): 1.5, ('g1', 'p1', 'error'): 0.1}, calcObject)
+    """
+    index = get_parameter_index(sheet, calcObject)
+    keys = list(dict.fromkeys((group, id) for group, id, field in updates))
+    if any(key not in index.rows for key in keys) or not _rows_match(index, keys):
+        index.refresh()
+    cells = dict()
+    for (group, id, field), value in updates.items():
+        cells[index.cell(group, id, field)] = _uno_value(value, 'formula')
+    _write_cells(index.sheetObject, cells, type='formula')
+    _forget(index.sheetObject, calcObject)
+
+
+def _cell_ranges(calcObject, sheetObject, rectangles):
+    """Return a SheetCellRanges container with several ranges of a sheet.
+
+    Args:
+        calcObject (Calc object): document of sheetObject.
+        sheetObject (sheet object): sheet.
+        rectangles (list): list of (col_init, row_init, col_final, row_final).
+    """
+    sheet_index = sheetObject.getRangeAddress().Sheet
+    addresses = tuple(uno.createUnoStruct('com.sun.star.table.CellRangeAddress', sheet_index, c0, r0, c1, r1)
+                      for c0, r0, c1, r1 in rectangles)
+    ranges = calcObject.createInstance('com.sun.star.sheet.SheetCellRanges')
+    ranges.addRangeAddresses(addresses, False)
+    return ranges
+
+
+def _group_runs(group_list):
+    """Return runs of consecutive equal items as a list of (first, last) indexes."""
+    runs = []
+    first = 0
+    for i in range(1, len(group_list)+1):
+        if i == len(group_list) or group_list[i] != group_list[first]:
+            runs.append((first, i-1))
+            first = i
+    return runs
+
+
+def _band_style(calcObject, color, name='pyCalc_group_band'):
+    """Return the name of a cell style with background color (created if needed)."""
+    styles = calcObject.StyleFamilies.getByName('CellStyles')
+    if styles.hasByName(name):
+        style = styles.getByName(name)
+    else:
+        style = calcObject.createInstance('com.sun.star.style.CellStyle')
+        styles.insertByName(name, style)
+    style.setPropertyValue('CellBackColor', color)
+    return name
+
+
+def group_color(sheet, calcObject=None, colors=(-1, 12771502), conditional=False):
+    """Color rows with alternating colors, changing color when the group changes.
+
+    Consecutive rows of the same group are colored with one call. If
+    calcObject is given, all runs with the same color are colored with a
+    single call.
+
+    Args:
+        sheet (str or sheet object): sheet name or sheet object.
+        calcObject (Calc object, optional): Object created by connect2calc().
+            Required if sheet is a name or ``conditional=True``.
+        colors (tuple, optional): two alternating colors (-1 is no color).
+        conditional (bool, optional): if True, the banding is set as a single
+            conditional format rule over the data rows, so it follows changes
+            in the rows without recoloring. Only the second color is used (the
+            first one is the cell background). The rule counts the group
+            changes above each row, so each recalculation costs O(n²) in the
+            number of rows; for large sheets that are recalculated often,
+            prefer the default (static colors).
+    """
 
     if type(sheet) == str:
         sheetObject = calcObject.get_sheet_by_name(sheet)
@@ -570,20 +3427,431 @@ def group_color(sheet, calcObject=None):
         sheetObject = sheet
 
     # header old_color_max
-    sheetObject.get_cell_range_by_position(0, 0, 10, 0).setPropertyValue('CellBackColor', 11711154)
-    sheetObject.get_cell_range_by_position(0, 0, 10, 0).setPropertyValue('CharWeight', 150)  # bold
+    header = sheetObject.get_cell_range_by_position(0, 0, 10, 0)
+    _set_properties(header, ('CellBackColor', 'CharWeight'), (11711154, 150))  # bold
 
-
-    group_rows = get_group(sheetObject)
-    old_group = group_rows[0]
-    color = -1
-    for row, group in enumerate(group_rows):
-        if group == old_group:
-            sheetObject.get_cell_range_by_position(0, row+1, 10, row+1).setPropertyValue('CellBackColor', color)
+    group_list = get_group(sheetObject)
+    if len(group_list) == 0:
+        return
+
+    if conditional:
+        if calcObject is None:
+            raise ValueError('calcObject is required for conditional=True.')
+        last_row = max(get_used_area(sheetObject)[0], len(group_list))
+        cellRange = sheetObject.get_cell_range_by_position(0, 1, 10, last_row)
+        cellRange.setPropertyValue('CellBackColor', colors[0])
+        # number of group changes up to this row is even for every other group
+        formula = 'AND($A2<>"";ISEVEN(SUMPRODUCT(($A$2:$A2<>$A$1:$A1)*1)))'
+        entries = cellRange.getPropertyValue('ConditionalFormat')
+        entries.clear()
+        # relative references of the formula are relative to SourcePosition (A2)
+        source = uno.createUnoStruct('com.sun.star.table.CellAddress', cellRange.getRangeAddress().Sheet, 0, 1)
+        entries.addNew(_property_values(Operator=uno.Enum('com.sun.star.sheet.ConditionOperator', 'FORMULA'),
+                                        Formula1=formula,
+                                        SourcePosition=source,
+                                        StyleName=_band_style(calcObject, colors[1])))
+        cellRange.setPropertyValue('ConditionalFormat', entries)
+        return
+
+    rectangles = ([], [])
+    for band, (first, last) in enumerate(_group_runs(group_list)):
+        rectangles[band % 2].append((0, first+1, 10, last+1))
+
+    for color, color_rectangles in zip(colors, rectangles):
+        if len(color_rectangles) == 0:
+            continue
+        if calcObject is not None:
+            _cell_ranges(calcObject, sheetObject, color_rectangles).setPropertyValue('CellBackColor', color)
         else:
-            old_group = group_rows[row]
-            if color == -1:
-                color = 12771502
-            else:
-                color = -1
-            sheetObject.get_cell_range_by_position(0, row+1, 10, row+1).setPropertyValue('CellBackColor', color)
+            for c0, r0, c1, r1 in color_rectangles:
+                sheetObject.get_cell_range_by_position(c0, r0, c1, r1).setPropertyValue('CellBackColor', color)
+
+
+# %% asyncio
+class AsyncCalc(object):
+    """Asyncio facade for one libreoffice instance.
+
+    Blocking calls run in a thread pool dedicated to this instance. Calls on
+    the same document run in the order they were awaited, while calls on
+    different documents (or different AsyncCalc instances) run concurrently.
+    At most ``max_concurrency`` calls run at the same time; the other callers
+    wait (backpressure).
+
+    Sheet-level calls are ordered with the calls on their document, so the
+    document must be known: pass ``calcObject``, or use a sheet object
+    returned by :py:meth:`get_sheet` or :py:meth:`loadCalc`.
+
+    Args:
+        port (int, optional): port for connection.
+        headless (bool, optional): if True, libreoffice runs without GUI.
+        profile (str or pathlib.Path, optional): user profile folder. Use
+            different ports and folders for each AsyncCalc.
+        timeout (float, optional): max time (in seconds) to wait for
+            libreoffice to start.
+        max_concurrency (int, optional): max number of simultaneous calls.
+        pipe (bool or str, optional): named pipe instead of the port (see
+            :py:func:`connect2Calc`).
+
+    Example:
+        >>> async def job(instance, file):
+        ...     calcObject = await instance.connect2Calc(file)
+        ...     sheetObject, parameters = await instance.loadCalc('Sheet1', calcObject)
+        ...     data = await instance.get_cells_value(sheetObject, 0, 0, 10, 10)
+        ...     ...
+        ...     await instance.update_xlsx(parameters, sheetObject, calcObject)
+        ...     await instance.saveCalc(calcObject)
+        ...     await instance.closeCalc(calcObject)
+        >>>
+        >>> async def main(files):
+        ...     async with AsyncCalc(port=8100, max_concurrency=2) as instance:
+        ...         await asyncio.gather(*[job(instance, file) for file in files])
+    """
+
+    def __init__(self, port=8100, headless=True, profile=None, timeout=60, max_concurrency=1, pipe=None):
+        self.port = port
+        self.pipe = _pipe_name(pipe)
+        self.headless = headless
+        self.profile = profile
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.context = None
+        self.pending = 0
+        self._process = None
+        self._executor = futures.ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix=f'pyCalc_{port}')
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._start_lock = asyncio.Lock()
+        self._locks = weakref.WeakKeyDictionary()  # document: asyncio.Lock
+        self._pinned_locks = dict()  # documents that cannot be weakly referenced (e.g., paths)
+        self._sheets = weakref.WeakKeyDictionary()  # sheet object: document
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def run(self, function, *args, document=None, **kwargs):
+        """Run a blocking function in the executor of this instance.
+
+        Args:
+            function (function): blocking function.
+            *args, **kwargs: arguments of function.
+            document (object, optional): calls with the same document object
+                run in order. If None, no order is enforced.
+        """
+        loop = asyncio.get_running_loop()
+        call = functools.partial(function, *args, **kwargs)
+        self.pending += 1
+        try:
+            if document is None:
+                async with self._semaphore:
+                    return await loop.run_in_executor(self._executor, call)
+            try:
+                lock = self._locks.setdefault(document, asyncio.Lock())
+            except TypeError:
+                lock = self._pinned_locks.setdefault(document, asyncio.Lock())
+            async with lock:
+                async with self._semaphore:
+                    return await loop.run_in_executor(self._executor, call)
+        finally:
+            self.pending -= 1
+
+    def _document(self, sheet, calcObject=None):
+        """Return the document that owns sheet (used to order the calls)."""
+        if calcObject is not None:
+            return calcObject
+        try:
+            document = self._sheets.get(sheet)
+        except TypeError:
+            document = None
+        if document is None:
+            raise ValueError('The document of the sheet is unknown. Pass calcObject, or get the sheet object '
+                             'with AsyncCalc.get_sheet() or AsyncCalc.loadCalc().')
+        return document
+
+    def _register(self, sheetObject, document):
+        try:
+            self._sheets[sheetObject] = document
+        except TypeError:
+            pass
+
+    async def start(self):
+        """Start libreoffice (if not started yet)."""
+        async with self._start_lock:
+            if self.context is None:
+                self._process = _start_soffice(self.port, headless=self.headless, profile=self.profile, pipe=self.pipe)
+                self.context = await self.run(_connect_context, self.port, process=self._process, timeout=self.timeout,
+                                              pipe=self.pipe)
+
+    async def connect2Calc(self, file=None):
+        """Awaitable :py:func:`connect2Calc`. Opens a document in this instance."""
+        await self.start()
+        return await self.run(_open_calc, self.context, file)
+
+    async def closeCalc(self, calcObject):
+        """Awaitable :py:func:`closeCalc`."""
+        try:
+            return await self.run(closeCalc, calcObject, document=calcObject)
+        finally:
+            try:
+                self._locks.pop(calcObject, None)
+            except TypeError:
+                self._pinned_locks.pop(calcObject, None)
+
+    async def get_sheet(self, calcObject, sheet):
+        """Return a sheet object (by name or index) whose calls are ordered with calcObject."""
+        method = calcObject.get_sheet_by_name if isinstance(sheet, str) else calcObject.get_sheet_by_index
+        sheetObject = await self.run(method, sheet, document=calcObject)
+        self._register(sheetObject, calcObject)
+        return sheetObject
+
+    async def saveCalc(self, calcObject, filepath=None):
+        """Awaitable :py:func:`saveCalc`."""
+        return await self.run(saveCalc, calcObject, filepath, document=calcObject)
+
+    async def loadCalc(self, sheet, calcObject=None, **kwargs):
+        """Awaitable :py:func:`loadCalc`."""
+        document = self._document(sheet, calcObject)
+        result = await self.run(loadCalc, sheet, calcObject, document=document, **kwargs)
+        self._register(result[0], document)
+        return result
+
+    async def update_xlsx(self, parameters, sheet, calcObject=None, **kwargs):
+        """Awaitable :py:func:`update_xlsx`."""
+        return await self.run(update_xlsx, parameters, sheet, calcObject, document=self._document(sheet, calcObject),
+                              **kwargs)
+
+    async def get_cells_value(self, sheetObject, *args, calcObject=None, **kwargs):
+        """Awaitable :py:func:`get_cells_value`. calcObject is required if the document of sheetObject is unknown."""
+        return await self.run(get_cells_value, sheetObject, *args, document=self._document(sheetObject, calcObject), **kwargs)
+
+    async def set_cells_value(self, sheetObject, *args, calcObject=None, **kwargs):
+        """Awaitable :py:func:`set_cells_value`. calcObject is required if the document of sheetObject is unknown."""
+        return await self.run(set_cells_value, sheetObject, *args, document=self._document(sheetObject, calcObject), **kwargs)
+
+    async def read_range_array(self, sheetObject, *args, calcObject=None, **kwargs):
+        """Awaitable :py:func:`read_range_array`. calcObject is required if the document of sheetObject is unknown."""
+        return await self.run(read_range_array, sheetObject, *args, document=self._document(sheetObject, calcObject), **kwargs)
+
+    async def close(self):
+        """Close libreoffice and the executor."""
+        if self.context is not None or self._process is not None:
+            await self.run(_terminate_soffice, self.context, self._process)
+        self.context = None
+        self._process = None
+        self._executor.shutdown(wait=False)
+
+
+# %% instrumentation
+_plain_types = (str, bytes, int, float, bool, tuple, list, dict, type(None))
+
+
+class _Traced(object):
+    """Proxy that counts and times the UNO calls of an object."""
+
+    __slots__ = ('_obj', '_profiler', '__weakref__')
+
+    def __init__(self, obj, profiler):
+        object.__setattr__(self, '_obj', obj)
+        object.__setattr__(self, '_profiler', profiler)
+
+    def __getattr__(self, name):
+        profiler = self._profiler
+        t0 = time.perf_counter()
+        attr = getattr(self._obj, name)
+        if callable(attr) and not isinstance(attr, _plain_types):
+            return profiler._method(attr, name)
+        profiler.record(name, t0, time.perf_counter() - t0)
+        return profiler.wrap(attr)
+
+    def __setattr__(self, name, value):
+        t0 = time.perf_counter()
+        setattr(self._obj, name, _untraced(value))
+        self._profiler.record(name, t0, time.perf_counter() - t0)
+
+    def __getitem__(self, index):
+        t0 = time.perf_counter()
+        item = self._obj[index]
+        self._profiler.record('__getitem__', t0, time.perf_counter() - t0)
+        return self._profiler.wrap(item)
+
+    def __iter__(self):
+        for item in self._obj:
+            yield self._profiler.wrap(item)
+
+    def __len__(self):
+        return len(self._obj)
+
+    def __eq__(self, other):
+        return self._obj == _untraced(other)
+
+    def __hash__(self):
+        return hash(self._obj)
+
+    def __repr__(self):
+        return f'<traced {self._obj!r}>'
+
+
+def _untraced(value):
+    """Return the object behind a _Traced proxy (also inside tuples/lists)."""
+    if isinstance(value, _Traced):
+        return object.__getattribute__(value, '_obj')
+    if isinstance(value, (tuple, list)):
+        return type(value)(_untraced(item) for item in value)
+    return value
+
+
+class Profiler(object):
+    """Counts and times UNO calls, per calling pyCalc function.
+
+    Calls are attributed to every public function (or method) of this module
+    in the call stack, e.g., ``copy_cell``, ``get_id``, or ``update_xlsx``:
+    'calls' and 'time' include the calls made by the functions it calls
+    (inclusive), and 'self_calls' and 'self_time' count only the calls made
+    by the function itself, as the innermost one (exclusive). The entry
+    points called from user code are listed in 'entry'. Calls made directly by
+    user code are attributed to '<user>'. In the trace, the category of each
+    call is its call path, e.g., 'update_xlsx > set_cells_value'.
+
+    Args:
+        trace (str or pathlib.Path, optional): if given, every call is also
+            kept and saved in Chrome trace format by :py:meth:`save_trace`
+            (open it in chrome://tracing or https://ui.perfetto.dev).
+    """
+
+    def __init__(self, trace=None):
+        self.trace = trace
+        self.stats = dict()
+        self.events = []
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def wrap(self, obj):
+        """Return a proxy that counts the UNO calls of obj."""
+        if isinstance(obj, (_Traced, ) + _plain_types) or isinstance(getattr(obj, 'typeName', None), str):
+            return obj  # structs are local copies, not bridge objects
+        return _Traced(obj, self)
+
+    def _method(self, method, name):
+        def traced(*args, **kwargs):
+            t0 = time.perf_counter()
+            result = method(*_untraced(args), **{k: _untraced(v) for k, v in kwargs.items()})
+            self.record(name, t0, time.perf_counter() - t0)
+            return self.wrap(result)
+        return traced
+
+    def _call_path(self):
+        """Return the public pyCalc functions in the call stack (outermost first)."""
+        frame = sys._getframe(3)
+        module = globals()
+        path = []
+        while frame is not None:
+            if frame.f_globals is module:
+                code = frame.f_code
+                name = getattr(code, 'co_qualname', code.co_name)
+                if not name.split('.')[-1].startswith('_') and not name.startswith(('_Traced', 'Profiler')):
+                    path.append(name)
+            frame = frame.f_back
+        path.reverse()
+        return path if len(path) > 0 else ['<user>']
+
+    def record(self, name, t0, dt):
+        """Record one UNO call (name, start time, and duration in seconds)."""
+        path = self._call_path()
+        with self._lock:
+            for function in dict.fromkeys(path):
+                stats = self.stats.get(function)
+                if stats is None:
+                    stats = self.stats[function] = dict(calls=0, time=0.0, self_calls=0, self_time=0.0,
+                                                        entry=False, methods=dict())
+                stats['calls'] += 1
+                stats['time'] += dt
+                stats['methods'][name] = stats['methods'].get(name, 0) + 1
+            self.stats[path[0]]['entry'] = True
+            stats = self.stats[path[-1]]
+            stats['self_calls'] += 1
+            stats['self_time'] += dt
+            if self.trace is not None:
+                self.events.append(dict(name=name, cat=' > '.join(path), ph='X', pid=os.getpid(),
+                                        tid=threading.get_ident(),
+                                        ts=(t0 - self._t0)*1e6, dur=dt*1e6))
+
+    def summary(self):
+        """Return {function: {'calls', 'time', 'self_calls', 'self_time', 'entry', 'methods'}}.
+
+        Functions are sorted by (inclusive) time.
+        """
+        with self._lock:
+            return dict(sorted(self.stats.items(), key=lambda item: -item[1]['time']))
+
+    def print_summary(self, file=None):
+        """Print calls and time per function (entry points are marked with *)."""
+        file = sys.stderr if file is None else file
+        print(f'{"function":<40} {"calls":>10} {"time (ms)":>12} {"self calls":>10} {"self (ms)":>12}  top methods',
+              file=file)
+        for function, stats in self.summary().items():
+            methods = sorted(stats['methods'].items(), key=lambda item: -item[1])[:3]
+            methods = ', '.join(f'{name} x{n}' for name, n in methods)
+            name = ('* ' if stats['entry'] else '  ') + function
+            print(f'{name:<40} {stats["calls"]:>10} {stats["time"]*1e3:>12.3f} {stats["self_calls"]:>10} '
+                  f'{stats["self_time"]*1e3:>12.3f}  {methods}', file=file)
+
+    def save_trace(self, filepath=None):
+        """Save calls in Chrome trace format (json)."""
+        filepath = self.trace if filepath is None else filepath
+        with self._lock:
+            Path(filepath).write_text(json.dumps(dict(traceEvents=self.events, displayTimeUnit='ms')))
+
+
+_profiler = None
+
+
+@contextmanager
+def profile(trace=None, summary=True):
+    """Context manager that counts and times UNO calls.
+
+    Calc objects created inside the block (by :py:func:`connect2Calc`,
+    :py:class:`CalcPool`, ...) count their calls and the calls of every object
+    obtained from them. Existing objects can be included with
+    ``profiler.wrap(obj)``. Profiling is also turned on for the whole run by
+    setting the environment variable ``PYCALC_PROFILE=1`` (and optionally
+    ``PYCALC_TRACE=<file>``).
+
+    When profiling is off, Calc objects are not wrapped, so there is no cost.
+
+    Args:
+        trace (str or pathlib.Path, optional): Chrome trace file saved at the
+            end of the block.
+        summary (bool, optional): if True, a summary is printed at the end of
+            the block.
+
+    Example:
+        >>> with profile(trace='trace.json') as profiler:
+        ...     calcObject = connect2Calc('file.ods')
+        ...     sheetObject, parameters = loadCalc('Sheet1', calcObject)
+        >>> profiler.summary()['loadCalc']['calls']
+        3
+    """
+    global _profiler
+    previous = _profiler
+    profiler = Profiler(trace=trace)
+    _profiler = profiler
+    try:
+        yield profiler
+    finally:
+        _profiler = previous
+        if summary:
+            profiler.print_summary()
+        if trace is not None:
+            profiler.save_trace()
+
+
+def _profile_at_exit(profiler):
+    profiler.print_summary()
+    if profiler.trace is not None:
+        profiler.save_trace()
+
+
+if os.environ.get('PYCALC_PROFILE', '') not in ('', '0'):
+    _profiler = Profiler(trace=os.environ.get('PYCALC_TRACE', None))
+    atexit.register(_profile_at_exit, _profiler)
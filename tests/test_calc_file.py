@@ -0,0 +1,177 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Tests of the office-free .ods/.xlsx reader (CalcFile, FileSheet).
+
+Files are built by hand from small xml snippets, so no office is needed::
+
+    python -m pytest tests
+"""
+
+# standard imports
+import sys
+import zipfile
+from pathlib import Path
+
+import pytest
+
+here = Path(__file__).resolve().parent
+sys.path.insert(0, str(here.parent))
+
+import pyCalc
+
+
+# %% ods
+_ods = '''<?xml version="1.0" encoding="UTF-8"?>
+<office:document-content xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0"
+ xmlns:table="urn:oasis:names:tc:opendocument:xmlns:table:1.0"
+ xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0" office:version="1.2">
+<office:body><office:spreadsheet>{tables}</office:spreadsheet></office:body></office:document-content>'''
+
+
+def ods_file(folder, tables, name='file.ods'):
+    """Write an .ods file. tables is {sheet name: xml of the rows}."""
+    xml = ''.join(f'<table:table table:name="{name}">{rows}</table:table>' for name, rows in tables.items())
+    path = Path(folder) / name
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('mimetype', 'application/vnd.oasis.opendocument.spreadsheet')
+        archive.writestr('content.xml', _ods.format(tables=xml))
+    return path
+
+
+def row(*cells, repeat=1):
+    return f'<table:table-row table:number-rows-repeated="{repeat}">' + ''.join(cells) + '</table:table-row>'
+
+
+def text(value, repeat=1):
+    return (f'<table:table-cell office:value-type="string" table:number-columns-repeated="{repeat}">'
+            f'<text:p>{value}</text:p></table:table-cell>')
+
+
+def number(value, shown=None, formula=None):
+    formula = '' if formula is None else f' table:formula="{formula}"'
+    shown = value if shown is None else shown
+    return (f'<table:table-cell office:value-type="float" office:value="{value}"{formula}>'
+            f'<text:p>{shown}</text:p></table:table-cell>')
+
+
+def empty(repeat=1):
+    return f'<table:table-cell table:number-columns-repeated="{repeat}"/>'
+
+
+def test_ods_sheet_names(tmp_path):
+    path = ods_file(tmp_path, {'First': row(text('a')), 'Second': row(text('b'))})
+    calcFile = pyCalc.CalcFile(path)
+    assert calcFile.sheet_names == ('First', 'Second')
+    assert calcFile.get_sheet_by_index(1).get_cell_value(0, 0) == 'b'
+    with pytest.raises(KeyError):
+        calcFile.read_sheet('Third')
+
+
+def test_ods_repeated_rows_and_columns(tmp_path):
+    rows = (row(text('x', repeat=3), empty(2), number(1)) +
+            row(empty(), repeat=2) +
+            row(number(2), repeat=2) +
+            row(empty(1024), repeat=1048500))  # trailing empty rows written by office
+    sheet = pyCalc.CalcFile(ods_file(tmp_path, {'Sheet1': rows})).get_sheet_by_index(0)
+    assert sheet.get_used_area() == (4, 5)
+    assert pyCalc.get_cells_value(sheet, 0, 0, 4, 5) == (('x', 'x', 'x', '', '', 1.0),
+                                                         ('', '', '', '', '', ''),
+                                                         ('', '', '', '', '', ''),
+                                                         (2.0, '', '', '', '', ''),
+                                                         (2.0, '', '', '', '', ''))
+
+
+def test_ods_text_elements(tmp_path):
+    # office writes 'a   b' as 'a <text:s text:c="2"/>b'
+    rows = row(text('a <text:s text:c="2"/>b'), text('<text:s/>lead'), text('c<text:tab/>d'),
+               text('e<text:line-break/>f'), text('<text:span>g</text:span>h<text:s text:c="3"/>'),
+               '<table:table-cell office:value-type="string"><office:annotation><text:p>note</text:p>'
+               '</office:annotation><text:p>one</text:p><text:p>two</text:p></table:table-cell>')
+    sheet = pyCalc.CalcFile(ods_file(tmp_path, {'Sheet1': rows})).get_sheet_by_index(0)
+    assert pyCalc.get_cells_value(sheet, 0, 0, 0, 5, type='data')[0] == ('a   b', ' lead', 'c\td', 'e\nf',
+                                                                         'gh   ', 'one\ntwo')
+
+
+def test_ods_types(tmp_path):
+    rows = row(number(0.5, shown='50%').replace('"float"', '"percentage"'),
+               '<table:table-cell office:value-type="boolean" office:boolean-value="true">'
+               '<text:p>TRUE</text:p></table:table-cell>',
+               '<table:table-cell office:value-type="date" office:date-value="2024-01-15">'
+               '<text:p>01/15/24</text:p></table:table-cell>',
+               '<table:table-cell office:value-type="time" office:time-value="PT12H00M00S">'
+               '<text:p>12:00:00</text:p></table:table-cell>',
+               number(3, formula='of:=[.A1]+[.B1:.C1]'))
+    sheet = pyCalc.CalcFile(ods_file(tmp_path, {'Sheet1': rows})).get_sheet_by_index(0)
+    assert pyCalc.get_cells_value(sheet, 0, 0, 0, 4, type='data')[0] == (0.5, 1.0, 45306.0, 0.5, 3.0)
+    assert pyCalc.get_cells_value(sheet, 0, 0, 0, 4, type='formula')[0] == ('0.5', 'TRUE', '45306', '0.5',
+                                                                            '=A1+B1:C1')
+    assert pyCalc.get_cell_value(sheet, 0, 2, type='data') == '01/15/24'
+
+
+# %% xlsx
+_main = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+
+
+def xlsx_file(folder, sheets, strings=(), name='file.xlsx'):
+    """Write an .xlsx file. sheets is {sheet name: xml of the rows}, strings are xml of the shared strings."""
+    path = Path(folder) / name
+    workbook = ''.join(f'<sheet name="{name}" sheetId="{i+1}" r:id="rId{i+1}"/>' for i, name in enumerate(sheets))
+    # absolute and relative targets are both valid
+    rels = ''.join(f'<Relationship Id="rId{i+1}" Type="worksheet" '
+                   f'Target="{"/xl/" if i % 2 else ""}worksheets/sheet{i+1}.xml"/>' for i in range(len(sheets)))
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('xl/workbook.xml', f'<workbook xmlns="{_main}" xmlns:r="http://schemas.openxmlformats.org/'
+                                            f'officeDocument/2006/relationships"><sheets>{workbook}</sheets></workbook>')
+        archive.writestr('xl/_rels/workbook.xml.rels', '<Relationships xmlns="http://schemas.openxmlformats.org/'
+                                                       f'package/2006/relationships">{rels}</Relationships>')
+        if strings:
+            archive.writestr('xl/sharedStrings.xml', f'<sst xmlns="{_main}">' + ''.join(strings) + '</sst>')
+        for i, rows in enumerate(sheets.values()):
+            archive.writestr(f'xl/worksheets/sheet{i+1}.xml',
+                             f'<worksheet xmlns="{_main}"><sheetData>{rows}</sheetData></worksheet>')
+    return path
+
+
+def test_xlsx_sheet_names(tmp_path):
+    path = xlsx_file(tmp_path, {'First': '', 'Second': '<row r="1"><c r="A1"><v>1</v></c></row>'})
+    calcFile = pyCalc.CalcFile(path)
+    assert calcFile.sheet_names == ('First', 'Second')
+    assert calcFile.get_sheet_by_name('Second').get_cell_value(0, 0, type='data') == '1'
+
+
+def test_xlsx_strings(tmp_path):
+    strings = ['<si><t>plain</t></si>',
+               '<si><r><t>ri</t></r><r><rPr><b/></rPr><t xml:space="preserve">ch  </t></r>'
+               '<rPh><t>skip</t></rPh></si>']
+    rows = ('<row r="1"><c r="A1" t="s"><v>0</v></c><c r="B1" t="s"><v>1</v></c>'
+            '<c r="C1" t="inlineStr"><is><t>inline</t></is></c></row>')
+    sheet = pyCalc.CalcFile(xlsx_file(tmp_path, {'Sheet1': rows}, strings)).get_sheet_by_index(0)
+    assert pyCalc.get_cells_value(sheet, 0, 0, 0, 2)[0] == ('plain', 'rich  ', 'inline')
+
+
+def test_xlsx_types_and_positions(tmp_path):
+    # cells without r attributes follow the previous cell/row
+    rows = ('<row r="2"><c r="B2"><v>1.5</v></c><c><f>B2*2</f><v>3</v></c><c t="b"><v>1</v></c>'
+            '<c t="str"><f>"a"&amp;"b"</f><v>ab</v></c></row>'
+            '<row><c r="A3" s="1"><v>45306</v></c><c r="D3"/></row>')
+    sheet = pyCalc.CalcFile(xlsx_file(tmp_path, {'Sheet1': rows})).get_sheet_by_index(0)
+    assert sheet.get_used_area() == (2, 4)
+    assert pyCalc.get_cells_value(sheet, 1, 0, 2, 4, type='data') == (('', 1.5, 3.0, 1.0, 'ab'),
+                                                                      (45306.0, '', '', '', ''))
+    assert pyCalc.get_cells_value(sheet, 1, 0, 1, 4, type='formula')[0] == ('', '1.5', '=B2*2', 'TRUE',
+                                                                            '="a"&"b"')
+
+
+# %% parameters
+def test_loadCalc_from_file(tmp_path):
+    header = ('group', 'id', 'description', 'dummy', 'min', 'guess', 'max', 'fit', 'error', 'warning', 'comments')
+    rows = (row(*[text(name) for name in header]) +
+            row(text('g0'), text('p0'), text('desc'), empty(), number(0), number(1.5), text('inf'),
+                number(3, formula='of:=[.F2]*2'), empty(3)) +
+            row(text('g0'), text('p1'), empty(2), text('-inf'), number(2), text('inf'), empty(4)))
+    path = ods_file(tmp_path, {'Sheet1': rows})
+    sheetObject, parameters = pyCalc.loadCalc('Sheet1', path)
+    assert list(parameters) == ['g0']
+    assert list(parameters['g0']['guess']) == [1.5, 2.0]
+    assert list(parameters['g0']['min']) == [0.0, -float('inf')]
+    assert parameters['g0']['fit'][0] == 3.0